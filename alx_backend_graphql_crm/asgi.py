@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_backend_graphql_crm.settings')
+# Under ASGI /graphql is served by the async view
+os.environ.setdefault('CRM_ASYNC_GRAPHQL', '1')
 
 application = get_asgi_application()
@@ -1,12 +1,16 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
-from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
 from  .schema import schema
+from crm.views import AsyncCRMGraphQLView, CRMGraphQLView, export_view
+
+GraphQLViewClass = AsyncCRMGraphQLView if settings.CRM_ASYNC_GRAPHQL else CRMGraphQLView
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-     path("graphql", csrf_exempt(GraphQLView.as_view(graphiql=True, schema=schema))),
+     path("graphql", csrf_exempt(GraphQLViewClass.as_view(graphiql=True, schema=schema))),
+    path("export/<str:resource>.<str:format>", export_view, name="crm-export"),
 ]
 
@@ -0,0 +1,135 @@
+"""In-process GraphQL benchmarks: latency percentiles, SQL counts and peak memory per operation.
+
+Run with ``manage.py benchmark_graphql``; the catalog lives in
+:mod:`crm.benchmarks.catalog`.
+"""
+import gc
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.db import transaction
+from django.test import RequestFactory
+
+from crm.instrumentation import QueryCounter
+
+from .catalog import get_catalog
+
+# A regression has to clear the relative tolerance and these absolute
+# margins, so sub-millisecond jitter on fast operations does not fail a run.
+LATENCY_SLACK_MS = 1.0
+MEMORY_SLACK_KIB = 64
+
+
+class BenchmarkError(Exception):
+    """An operation in the catalog returned GraphQL errors."""
+
+
+def _execute(schema, operation, variables):
+    # A fresh request per run, as the view gives every request its own loaders
+    request = RequestFactory().post('/graphql')
+    if not operation.mutation:
+        return schema.execute(operation.document, variables=variables, context_value=request)
+    with transaction.atomic():
+        result = schema.execute(operation.document, variables=variables, context_value=request)
+        transaction.set_rollback(True)
+    return result
+
+
+def _percentile(samples, percent):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[percent - 1]
+
+
+def run_operation(schema, operation, iterations=50, warmup=3):
+    """Time ``iterations`` runs of ``operation``; memory is measured on one extra, untimed run."""
+    variables = operation.variables()
+    for _ in range(warmup):
+        result = _execute(schema, operation, variables)
+        if result.errors:
+            raise BenchmarkError(f"{operation.name}: {result.errors[0]}")
+
+    samples = []
+    with QueryCounter() as counter:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            _execute(schema, operation, variables)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        _execute(schema, operation, variables)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': round(_percentile(samples, 50), 3),
+        'p95_ms': round(_percentile(samples, 95), 3),
+        'p99_ms': round(_percentile(samples, 99), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        # Every run issues the same statements; savepoints of mutations included
+        'sql_queries': counter.count // iterations,
+        'peak_memory_kib': round(peak / 1024, 1),
+    }
+
+
+def run_catalog(schema, operations=None, iterations=50, warmup=3, dataset=None, progress=None):
+    """Benchmark every operation and return the JSON-ready report."""
+    results = {}
+    for operation in operations if operations is not None else get_catalog(schema):
+        results[operation.name] = run_operation(schema, operation, iterations, warmup)
+        if progress:
+            progress(operation.name, results[operation.name])
+    return {
+        'meta': {
+            'dataset': dataset or {},
+            'iterations': iterations,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, tolerance=0.5, latency=False, memory=False):
+    """Regressions of ``report`` against ``baseline`` as human-readable strings.
+
+    Any extra SQL query is a regression. Median latency and peak memory are
+    absolute figures that only hold on the machine and Python that recorded
+    the baseline, so they are compared only with ``latency`` and ``memory``,
+    and may then grow by ``tolerance`` (a fraction) before they count. The
+    tail percentiles are reported but too noisy across runs to gate on.
+    """
+    regressions = []
+    for name, result in report['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        if result['sql_queries'] > base['sql_queries']:
+            regressions.append(f"{name}: {result['sql_queries']} SQL queries, baseline {base['sql_queries']}")
+        limit = max(base['p50_ms'] * (1 + tolerance), base['p50_ms'] + LATENCY_SLACK_MS)
+        if latency and result['p50_ms'] > limit:
+            regressions.append(f"{name}: p50 {result['p50_ms']:.3f}ms, baseline {base['p50_ms']:.3f}ms")
+        limit = max(base['peak_memory_kib'] * (1 + tolerance), base['peak_memory_kib'] + MEMORY_SLACK_KIB)
+        if memory and result['peak_memory_kib'] > limit:
+            regressions.append(
+                f"{name}: peak memory {result['peak_memory_kib']:.1f}KiB, baseline {base['peak_memory_kib']:.1f}KiB"
+            )
+    return regressions
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
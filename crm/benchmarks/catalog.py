@@ -0,0 +1,186 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from crm.filters import CustomerFilter, OrderFilter, ProductFilter
+from crm.models import Customer, Order, Product
+
+
+class Operation:
+    """One catalog entry: a GraphQL document and how to build its variables.
+
+    ``variables`` is called once against the seeded database, so values can
+    point at rows that exist. Mutations run in a transaction that is rolled
+    back after every iteration.
+    """
+
+    def __init__(self, name, document, variables=None, mutation=False):
+        self.name = name
+        self.document = document
+        self.variables = variables or (lambda: {})
+        self.mutation = mutation
+
+
+def _days_ago(days):
+    return (timezone.now() - timedelta(days=days)).isoformat()
+
+
+def _popular_product():
+    return str(Product.objects.annotate(order_count=Count('orders')).order_by('-order_count', 'pk').values_list('pk', flat=True)[0])
+
+
+def _customer_id():
+    return str(Customer.objects.order_by('pk').values_list('pk', flat=True)[0])
+
+
+def _order_items():
+    products = Product.objects.filter(stock__gte=2).order_by('pk').values_list('pk', flat=True)[:3]
+    return [{'productId': str(pk), 'quantity': 2} for pk in products]
+
+
+# Root field, filterset, and a value per declared filter picked to match a
+# realistic share of the generated data (see generate_data).
+FILTER_VALUES = [
+    ('allCustomers', CustomerFilter, {
+        'name': lambda: 'ali',
+        'email': lambda: 'smith',
+        'created_at_gte': lambda: _days_ago(30),
+        'created_at_lte': lambda: _days_ago(335),
+        'phone_pattern': lambda: '+25471',
+        'search': lambda: 'alice',
+    }),
+    ('allProducts', ProductFilter, {
+        'name': lambda: 'lamp',
+        'price_gte': lambda: '200',
+        'price_lte': lambda: '20',
+        'stock_gte': lambda: '450',
+        'stock_lte': lambda: '50',
+        'low_stock': lambda: True,
+        'search': lambda: 'wireless',
+    }),
+    ('allOrders', OrderFilter, {
+        'total_amount_gte': lambda: str(Order.objects.aggregate(top=Max('total_amount'))['top'] * Decimal('0.5')),
+        'total_amount_lte': lambda: '50',
+        'order_date_gte': lambda: _days_ago(30),
+        'order_date_lte': lambda: _days_ago(335),
+        'customer_name': lambda: 'garcia',
+        'product_name': lambda: 'lamp',
+        'product_id': _popular_product,
+        'search': lambda: 'alice',
+    }),
+]
+
+
+def _bulk_orders(count):
+    customers = [str(pk) for pk in Customer.objects.order_by('pk').values_list('pk', flat=True)[:count]]
+    products = [str(pk) for pk in Product.objects.filter(stock__gte=count).order_by('pk').values_list('pk', flat=True)[:3]]
+    return [{'customerId': customers[i % len(customers)], 'productIds': products} for i in range(count)]
+
+
+def _camel(name):
+    first, *rest = name.split('_')
+    return first + ''.join(part.title() for part in rest)
+
+
+def filter_operations(schema):
+    """One ``first: 50`` page per filter of every filterset, typed from the schema."""
+    query_type = schema.graphql_schema.query_type
+    operations = []
+    for field_name, filterset_class, values in FILTER_VALUES:
+        arguments = query_type.fields[field_name].args
+        for filter_name in filterset_class.base_filters:
+            argument = _camel(filter_name)
+            value = values[filter_name]
+            operations.append(Operation(
+                f"{field_name}.{argument}",
+                f"query Bench($value: {arguments[argument].type}) {{ "
+                f"{field_name}(first: 50, {argument}: $value) {{ edges {{ node {{ id }} }} }} }}",
+                lambda value=value: {'value': value()},
+            ))
+    return operations
+
+
+QUERIES = [
+    Operation('allOrders.nested', """
+        query Bench {
+            allOrders(first: 50) {
+                edges {
+                    node {
+                        id orderDate totalAmount
+                        customer { name email }
+                        products { name price }
+                    }
+                }
+            }
+        }
+    """),
+    Operation('allOrders.keyset', """
+        query Bench {
+            allOrders(first: 50, keyset: true, orderBy: "-orderDate") {
+                edges { node { id orderDate customer { name } } }
+            }
+        }
+    """),
+    Operation('crmStats.report', """
+        query Bench { crmStats { customerCount orderCount revenue } }
+    """),
+    Operation('crmStats.weekly', """
+        query Bench($dateFrom: DateTime) {
+            crmStats(dateFrom: $dateFrom, granularity: WEEK) {
+                orderCount revenue periods { period orderCount revenue }
+            }
+        }
+    """, lambda: {'dateFrom': _days_ago(90)}),
+    Operation('salesTimeSeries.weekly', """
+        query Bench($dateFrom: Date) {
+            salesTimeSeries(dateFrom: $dateFrom, granularity: WEEK) { period orderCount revenue }
+        }
+    """, lambda: {'dateFrom': _days_ago(90)[:10]}),
+    Operation('salesTimeSeries.product', """
+        query Bench($productId: ID) {
+            salesTimeSeries(productId: $productId, granularity: MONTH) { period orderCount quantity revenue }
+        }
+    """, lambda: {'productId': _popular_product()}),
+]
+
+MUTATIONS = [
+    Operation('createCustomer', """
+        mutation Bench($input: CustomerInput!) {
+            createCustomer(input: $input) { customer { id } message }
+        }
+    """, lambda: {'input': {'name': 'Bench Customer', 'email': 'bench@example.com', 'phone': '+254700000000'}},
+        mutation=True),
+    Operation('bulkCreateCustomers', """
+        mutation Bench($input: [CustomerInput]!) {
+            bulkCreateCustomers(input: $input) { customers { id } errors }
+        }
+    """, lambda: {'input': [
+        {'name': f'Bench Customer {i}', 'email': f'bench.{i}@example.com'} for i in range(100)
+    ]}, mutation=True),
+    Operation('createProduct', """
+        mutation Bench($input: ProductInput!) {
+            createProduct(input: $input) { product { id } }
+        }
+    """, lambda: {'input': {'name': 'Bench Product', 'price': '19.99', 'stock': 10}}, mutation=True),
+    Operation('createOrder', """
+        mutation Bench($input: OrderInput!) {
+            createOrder(input: $input) { order { id totalAmount items { quantity unitPrice product { name } } } }
+        }
+    """, lambda: {'input': {'customerId': _customer_id(), 'items': _order_items()}}, mutation=True),
+    Operation('bulkCreateOrders', """
+        mutation Bench($input: [OrderInput!]!) {
+            bulkCreateOrders(input: $input) { orders { id totalAmount } errors }
+        }
+    """, lambda: {'input': _bulk_orders(100)}, mutation=True),
+    Operation('updateLowStockProducts', """
+        mutation Bench {
+            updateLowStockProducts { updatedProducts { id stock } message }
+        }
+    """, mutation=True),
+]
+
+
+def get_catalog(schema):
+    return QUERIES + filter_operations(schema) + MUTATIONS
@@ -0,0 +1,110 @@
+from django.conf import settings
+from graphene_django.settings import graphene_settings
+from graphql import GraphQLError, get_named_type, get_nullable_type, is_list_type, is_object_type
+from graphql.execution.values import get_argument_values
+from graphql.language import FieldNode, FragmentDefinitionNode, FragmentSpreadNode, InlineFragmentNode
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_COST': 10000,
+    'MAX_DEPTH': 10,
+    # Objects assumed per plain list field (e.g. Order.products) when nothing bounds it
+    'LIST_FAN_OUT': 10,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CRM_QUERY_COST', {})}
+
+
+class QueryCost:
+    """Static estimate of how many objects an operation can resolve, and how deep it nests."""
+
+    def __init__(self, schema, document, operation, variables=None, config=None):
+        self.schema = schema
+        self.operation = operation
+        self.variables = variables or {}
+        self.config = config or get_config()
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        self.cost = 0
+        self.depth = 0
+        root_type = schema.get_root_type(operation.operation)
+        self._visit(root_type, operation.selection_set, 1, 1)
+
+    def as_extension(self):
+        return {
+            'requested': self.cost,
+            'maximum': self.config['MAX_COST'],
+            'depth': self.depth,
+            'maximumDepth': self.config['MAX_DEPTH'],
+        }
+
+    def errors(self):
+        errors = []
+        if self.cost > self.config['MAX_COST']:
+            errors.append(GraphQLError(
+                f"Query cost {self.cost} exceeds the maximum of {self.config['MAX_COST']}. "
+                "Request fewer items with first/last or select fewer nested lists."
+            ))
+        if self.depth > self.config['MAX_DEPTH']:
+            errors.append(GraphQLError(
+                f"Query depth {self.depth} exceeds the maximum of {self.config['MAX_DEPTH']}."
+            ))
+        return errors
+
+    def _fields(self, parent_type, selection_set):
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield parent_type, selection
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = self.schema.get_type(selection.type_condition.name.value) or parent_type
+                yield from self._fields(fragment_type, selection.selection_set)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = self.fragments.get(selection.name.value)
+                if fragment is not None:
+                    fragment_type = self.schema.get_type(fragment.type_condition.name.value) or parent_type
+                    yield from self._fields(fragment_type, fragment.selection_set)
+
+    def _visit(self, parent_type, selection_set, multiplier, depth, page_size=None):
+        self.depth = max(self.depth, depth)
+        for field_parent, node in self._fields(parent_type, selection_set):
+            if not is_object_type(field_parent):
+                continue
+            field = field_parent.fields.get(node.name.value)
+            if field is None or node.selection_set is None:
+                # Scalars are columns of an object already paid for
+                continue
+
+            field_type = get_nullable_type(field.type)
+            named_type = get_named_type(field_type)
+            count = multiplier
+            if page_size is not None and node.name.value == 'edges':
+                # The edges of a connection are its page, not an unbounded list
+                count = multiplier * page_size
+            elif is_list_type(field_type):
+                count = multiplier * self.config['LIST_FAN_OUT']
+
+            self.cost += count
+            child_page_size = self._page_size(field, node) if self._is_connection(named_type) else None
+            self._visit(named_type, node.selection_set, count, depth + 1, child_page_size)
+
+    @staticmethod
+    def _is_connection(graphql_type):
+        return is_object_type(graphql_type) and 'edges' in graphql_type.fields and 'pageInfo' in graphql_type.fields
+
+    def _page_size(self, field, node):
+        try:
+            args = get_argument_values(field, node, self.variables)
+        except GraphQLError:
+            # Invalid arguments fail at execution anyway; assume the largest page
+            args = {}
+        sizes = [args[name] for name in ('first', 'last') if args.get(name) is not None]
+        if sizes:
+            return max(min(sizes), 0)
+        return graphene_settings.RELAY_CONNECTION_MAX_LIMIT or self.config['LIST_FAN_OUT']
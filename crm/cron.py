@@ -1,8 +1,7 @@
 import logging
 from datetime import datetime
-from gql import gql, Client
-from gql.transport.aiohttp import AIOHTTPTransport
-from gql.transport.requests import RequestsHTTPTransport
+
+from .graphql_client import execute_query
 
 # Configure logging
 logging.basicConfig(
@@ -21,14 +20,12 @@ def log_crm_heartbeat():
     
     # Query GraphQL hello field
     try:
-        transport = AIOHTTPTransport(url="http://localhost:8000/graphql")
-        client = Client(transport=transport, fetch_schema_from_transport=True)
-        query = gql("""
+        query = """
             query {
                 hello
             }
-        """)
-        result = client.execute(query)
+        """
+        result = execute_query(query)
         logging.info(f"{timestamp} GraphQL hello response: {result['hello']}")
     except Exception as e:
         logging.error(f"{timestamp} GraphQL query failed: {str(e)}")
@@ -44,12 +41,8 @@ logging.basicConfig(
 )
 
 def update_low_stock():
-    # Set up GraphQL client
-    transport = AIOHTTPTransport(url="http://localhost:8000/graphql")
-    client = Client(transport=transport, fetch_schema_from_transport=True)
-    
     # Define GraphQL mutation
-    mutation = gql("""
+    mutation = """
         mutation {
             updateLowStockProducts {
                 updatedProducts {
@@ -59,11 +52,11 @@ def update_low_stock():
                 message
             }
         }
-    """)
+    """
     
     try:
         # Execute the mutation
-        result = client.execute(mutation)
+        result = execute_query(mutation)
         updated_products = result["updateLowStockProducts"]["updatedProducts"]
         message = result["updateLowStockProducts"]["message"]
         
@@ -1,10 +1,19 @@
 #!/usr/bin/env python3
 
-from gql import gql, Client
-from gql.transport.aiohttp import AIOHTTPTransport
-from datetime import datetime, timedelta
+import os
+import sys
 import logging
 
+# Run inside the project so the schema can be executed in-process
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql_crm.settings")
+
+import django
+
+django.setup()
+
+from crm.reminders import send_order_reminders
+
 # Configure logging
 logging.basicConfig(
     filename="/tmp/order_reminders_log.txt",
@@ -13,37 +22,18 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M:%S",
 )
 
-# GraphQL client
-transport = AIOHTTPTransport(url="http://localhost:8000/graphql")
-client = Client(transport=transport, fetch_schema_from_transport=True)
-
-# GraphQL query
-query = gql("""
-    query GetPendingOrders($date: DateTime!) {
-        orders(orderDate_Gte: $date) {
-            id
-            customer {
-                email
-            }
-        }
-    }
-""")
-
-# Calculate orders within the last 7 days
-date_threshold = datetime.now() - timedelta(days=7)
-
-try:
-    # Execute the query
-    result = client.execute(query, variable_values={"date": date_threshold.isoformat()})
-    
-    # Log order's ID and customer email
-    for order in result["orders"]:
-        logging.info(f"Order ID: {order['id']}, Customer Email: {order['customer']['email']}")
-    
-    # ompletion message
-    print("Order reminders processed!")
-
-except Exception as e:
-    # Log errors
-    logging.error(f"Error processing order reminders: {str(e)}")
-    print(f"Error occurred: {str(e)}")
\ No newline at end of file
+
+def main():
+    try:
+        # Only orders newer than the last successful run; one reminder per customer
+        queued = send_order_reminders()
+        logging.info(f"Queued {queued} order reminders")
+        print("Order reminders processed!")
+    except Exception as e:
+        # Log errors
+        logging.error(f"Error processing order reminders: {str(e)}")
+        print(f"Error occurred: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
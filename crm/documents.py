@@ -0,0 +1,77 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from graphql import parse
+from graphql.validation import validate
+
+PERSISTED_QUERY_KEY_PREFIX = 'crm:persisted-query:'
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+class DocumentCache:
+    """Bounded LRU of parsed and validated GraphQL documents keyed by the query's sha256.
+
+    Parse and syntax errors are not cached; validation errors are, so a bad
+    document is rejected without being validated again.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, schema, query, rules=None, max_errors=None):
+        """Return ``(document, validation_errors)`` for ``query`` against ``schema``."""
+        key = (id(schema), tuple(rules or ()), query_hash(query))
+        with self._lock:
+            cached = self._documents.get(key)
+            if cached is not None:
+                self._documents.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        document = parse(query)
+        cached = (document, validate(schema, document, rules, max_errors))
+        with self._lock:
+            self._documents[key] = cached
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+        return cached
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+    def __len__(self):
+        return len(self._documents)
+
+
+_document_cache = None
+
+
+def get_document_cache():
+    global _document_cache
+    if _document_cache is None:
+        _document_cache = DocumentCache(getattr(settings, 'CRM_DOCUMENT_CACHE_SIZE', 256))
+    return _document_cache
+
+
+def _persisted_query_cache():
+    return caches[getattr(settings, 'CRM_PERSISTED_QUERY_CACHE', 'default')]
+
+
+def get_persisted_query(sha256_hash):
+    return _persisted_query_cache().get(PERSISTED_QUERY_KEY_PREFIX + sha256_hash)
+
+
+def persist_query(sha256_hash, query):
+    _persisted_query_cache().set(PERSISTED_QUERY_KEY_PREFIX + sha256_hash, query, timeout=None)
@@ -0,0 +1,116 @@
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .filters import CustomerFilter, OrderFilter
+from .models import Customer, Order, OrderItem
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _order_rows(queryset):
+    for order in queryset:
+        items = order.items.all()
+        yield {
+            'id': order.pk,
+            'order_date': order.order_date,
+            'total_amount': order.total_amount,
+            'customer_id': order.customer_id,
+            'customer_name': order.customer.name,
+            'customer_email': order.customer.email,
+            'product_ids': [item.product_id for item in items],
+            'product_names': [item.product.name for item in items],
+            'quantities': [item.quantity for item in items],
+        }
+
+
+def _customer_rows(queryset):
+    for customer in queryset:
+        yield {
+            'id': customer.pk,
+            'name': customer.name,
+            'email': customer.email,
+            'phone': customer.phone,
+            'created_at': customer.created_at,
+        }
+
+
+def _orders_queryset(queryset):
+    return (
+        # Product filters join the products table; selecting by pk keeps one row per order
+        Order.objects.filter(pk__in=queryset.values('pk'))
+        .select_related('customer')
+        .only('id', 'order_date', 'total_amount', 'customer__name', 'customer__email')
+        .prefetch_related(Prefetch(
+            'items',
+            queryset=OrderItem.objects.select_related('product')
+            .only('order_id', 'quantity', 'product__name')
+            .order_by('product_id'),
+        ))
+    )
+
+
+class Export:
+    def __init__(self, model, filterset_class, columns, rows, queryset=None):
+        self.model = model
+        self.filterset_class = filterset_class
+        self.columns = columns
+        self.rows = rows
+        self.queryset = queryset or (lambda queryset: queryset)
+
+
+EXPORTS = {
+    'orders': Export(
+        Order,
+        OrderFilter,
+        ['id', 'order_date', 'total_amount', 'customer_id', 'customer_name', 'customer_email', 'product_ids', 'product_names',
+         'quantities'],
+        _order_rows,
+        _orders_queryset,
+    ),
+    'customers': Export(
+        Customer,
+        CustomerFilter,
+        ['id', 'name', 'email', 'phone', 'created_at'],
+        _customer_rows,
+    ),
+}
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return ';'.join(str(item) for item in value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def stream_rows(export, queryset, format, chunk_size=None):
+    """Yield ``queryset`` as CSV or NDJSON lines, holding one chunk of rows at a time.
+
+    ``iterator(chunk_size=...)`` runs the items prefetch once per chunk, so
+    items are fetched in batches rather than per order.
+    """
+    chunk_size = chunk_size or getattr(settings, 'CRM_EXPORT_CHUNK_SIZE', 2000)
+    rows = export.rows(export.queryset(queryset).order_by('pk').iterator(chunk_size=chunk_size))
+    if format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(export.columns)
+        for row in rows:
+            yield writer.writerow([_csv_value(row[column]) for column in export.columns])
+    else:
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
@@ -0,0 +1,53 @@
+import graphene
+from graphene_django.filter import DjangoFilterConnectionField
+from promise import Promise
+
+from .pagination import resolve_keyset_connection
+
+
+class CRMFilterConnectionField(DjangoFilterConnectionField):
+    """Filter connection that primes the node type's loaders with each page.
+
+    Once a page of nodes is known, every relation the nodes will ask for is
+    queued on the request loaders so the first resolver dispatches a single
+    batched query for the whole page.
+
+    ``order_by`` is exposed as a real argument (DjangoFilterConnectionField
+    swallows it), and ``keyset=True`` adds an opt-in ``keyset`` argument that
+    switches the connection from OFFSET paging to cursor seeks.
+    """
+
+    def __init__(self, type_, *args, order_by=None, keyset=False, **kwargs):
+        extra_args = dict(kwargs.pop('args', None) or {})
+        if order_by is not None:
+            extra_args['order_by'] = order_by
+        if keyset:
+            extra_args['keyset'] = graphene.Boolean(
+                default_value=False,
+                description="Use keyset cursors (sort key + id) instead of offsets.",
+            )
+        super().__init__(type_, *args, args=extra_args, **kwargs)
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None):
+        if args.get('keyset'):
+            return resolve_keyset_connection(connection, args, iterable, max_limit)
+        return super().resolve_connection(connection, args, iterable, max_limit)
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, default_manager, queryset_resolver,
+                            max_limit, enforce_first_or_last, root, info, **args):
+        result = super().connection_resolver(
+            resolver, connection, default_manager, queryset_resolver,
+            max_limit, enforce_first_or_last, root, info, **args
+        )
+
+        def prime(page):
+            prime_loaders = getattr(connection._meta.node, 'prime_loaders', None)
+            if prime_loaders is not None:
+                prime_loaders(info, [edge.node for edge in page.edges])
+            return page
+
+        if Promise.is_thenable(result):
+            return Promise.resolve(result).then(prime)
+        return prime(result)
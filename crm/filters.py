@@ -1,5 +1,6 @@
 from django_filters import rest_framework as filters
 from .models import Customer, Product, Order
+from .search import search, search_orders
 import re
 
 class CustomerFilter(filters.FilterSet):
@@ -8,10 +9,14 @@ class CustomerFilter(filters.FilterSet):
     created_at_gte = filters.DateTimeFilter(field_name='created_at', lookup_expr='gte')
     created_at_lte = filters.DateTimeFilter(field_name='created_at', lookup_expr='lte')
     phone_pattern = filters.CharFilter(method='filter_phone_pattern')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Customer
-        fields = ['name', 'email', 'created_at_gte', 'created_at_lte', 'phone_pattern']
+        fields = ['name', 'email', 'created_at_gte', 'created_at_lte', 'phone_pattern', 'search']
+
+    def filter_search(self, queryset, name, value):
+        return search(queryset, value)
 
     def filter_phone_pattern(self, queryset, name, value):
         if value:
@@ -26,10 +31,14 @@ class ProductFilter(filters.FilterSet):
     stock_gte = filters.NumberFilter(field_name='stock', lookup_expr='gte')
     stock_lte = filters.NumberFilter(field_name='stock', lookup_expr='lte')
     low_stock = filters.BooleanFilter(method='filter_low_stock')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Product
-        fields = ['name', 'price_gte', 'price_lte', 'stock_gte', 'stock_lte', 'low_stock']
+        fields = ['name', 'price_gte', 'price_lte', 'stock_gte', 'stock_lte', 'low_stock', 'search']
+
+    def filter_search(self, queryset, name, value):
+        return search(queryset, value)
 
     def filter_low_stock(self, queryset, name, value):
         if value:
@@ -44,10 +53,14 @@ class OrderFilter(filters.FilterSet):
     customer_name = filters.CharFilter(method='filter_customer_name')
     product_name = filters.CharFilter(method='filter_product_name')
     product_id = filters.NumberFilter(method='filter_product_id')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Order
-        fields = ['total_amount_gte', 'total_amount_lte', 'order_date_gte', 'order_date_lte', 'customer_name', 'product_name', 'product_id']
+        fields = ['total_amount_gte', 'total_amount_lte', 'order_date_gte', 'order_date_lte', 'customer_name', 'product_name', 'product_id', 'search']
+
+    def filter_search(self, queryset, name, value):
+        return search_orders(queryset, value)
 
     def filter_customer_name(self, queryset, name, value):
         return queryset.filter(customer__name__icontains=value)
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpRequest
+
+from .response_cache import get_config as get_response_cache_config
+
+TRANSPORTS = ('inprocess', 'http')
+
+
+class GraphQLClientError(Exception):
+    """The operation returned errors; ``errors`` holds them as formatted dicts."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(error.get('message', str(error)) for error in errors))
+
+
+def execute_query(document, variables=None, operation_name=None):
+    """Run a GraphQL ``document`` for a background job and return its ``data``.
+
+    With ``CRM_GRAPHQL_TRANSPORT = 'inprocess'`` (the default) the document is
+    executed in the calling process the way the GraphQL view executes it; with
+    ``'http'`` it is posted to ``CRM_GRAPHQL_URL``. Either way the data is
+    JSON-shaped, as a client would receive it, and errors raise
+    GraphQLClientError.
+    """
+    transport = getattr(settings, 'CRM_GRAPHQL_TRANSPORT', 'inprocess')
+    if transport == 'inprocess':
+        return _execute_inprocess(document, variables, operation_name)
+    if transport == 'http':
+        return _execute_http(document, variables, operation_name)
+    raise ValueError(f"Unknown CRM_GRAPHQL_TRANSPORT {transport!r}; expected one of {TRANSPORTS}.")
+
+
+def _execute_inprocess(document, variables, operation_name):
+    from alx_backend_graphql_crm.schema import schema
+
+    from .views import CRMGraphQLView
+
+    cache = get_response_cache_config()
+    if cache['ENABLED'] and cache['STORE'] == 'local':
+        # The job's invalidations would only reach its own process, never the web workers'
+        raise ImproperlyConfigured(
+            "In-process GraphQL jobs need CRM_RESPONSE_CACHE['STORE'] = 'django' (a cache every "
+            "process shares) while the response cache is enabled, or CRM_GRAPHQL_TRANSPORT = 'http'."
+        )
+
+    # Stands in for the HTTP request resolvers receive as their context
+    request = HttpRequest()
+    request.method = 'POST'
+    # The view's path: cached parse and validation, the cost budget, the
+    # response cache and atomic mutations, without the HTTP round trip
+    view = CRMGraphQLView(schema=schema)
+    result = view.execute_document(request, document, variables, operation_name)
+    if result.errors:
+        raise GraphQLClientError([view.format_error(error) for error in result.errors])
+    return result.data
+
+
+def _execute_http(document, variables, operation_name):
+    # Only needed in http mode
+    from gql import Client, gql
+    from gql.transport.aiohttp import AIOHTTPTransport
+    from gql.transport.exceptions import TransportQueryError
+
+    transport = AIOHTTPTransport(url=getattr(settings, 'CRM_GRAPHQL_URL', 'http://localhost:8000/graphql'))
+    client = Client(transport=transport)
+    try:
+        return client.execute(gql(document), variable_values=variables, operation_name=operation_name)
+    except TransportQueryError as e:
+        raise GraphQLClientError(e.errors or [{'message': str(e)}])
@@ -0,0 +1,118 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Case, F, Q, When
+
+from .models import Product
+from .utils import chunked
+
+
+class InsufficientStock(Exception):
+    """Some products have less stock than requested; nothing was taken."""
+
+    def __init__(self, shortages):
+        # {product_pk: (requested, available)}
+        self.shortages = shortages
+        super().__init__(', '.join(
+            f"product {pk}: requested {requested}, available {available}"
+            for pk, (requested, available) in shortages.items()
+        ))
+
+
+def reserve_stock(quantities, using=None):
+    """Take ``quantities`` ({product_pk: quantity}) off stock in one conditional UPDATE.
+
+    ``stock = stock - quantity`` only applies where ``stock >= quantity``, so
+    concurrent checkouts cannot oversell and no row is locked while Python
+    runs. Either every product is decremented or none is. More products than
+    the backend takes parameters for are split over several UPDATEs in the
+    same transaction.
+    """
+    if not quantities:
+        return
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    items = list(quantities.items())
+    # Each product's pk and quantity appear twice: in the WHERE and in the CASE
+    batch_size = max(connection.ops.bulk_batch_size(['pk', 'stock'] * 2, items), 1)
+
+    products = Product.objects.using(using)
+    with transaction.atomic(using=using):
+        updated = 0
+        for batch in chunked(items, batch_size):
+            condition = Q()
+            decrements = []
+            for pk, quantity in batch:
+                condition |= Q(pk=pk, stock__gte=quantity)
+                decrements.append(When(pk=pk, then=F('stock') - quantity))
+            updated += products.filter(condition).update(stock=Case(*decrements, default=F('stock')))
+        if updated == len(quantities):
+            return
+        # Undo the products that did have enough
+        transaction.set_rollback(True, using=using)
+
+    available = {}
+    for batch in chunked(list(quantities), batch_size):
+        available.update(products.filter(pk__in=batch).values_list('pk', 'stock'))
+    raise InsufficientStock({
+        pk: (quantity, available.get(pk, 0))
+        for pk, quantity in quantities.items()
+        if available.get(pk, 0) < quantity
+    })
+
+
+def _can_update_returning(connection):
+    # MariaDB has INSERT ... RETURNING but not UPDATE ... RETURNING
+    return connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert
+
+
+def restock(threshold, increment, chunk_size=None, using=None):
+    """Add ``increment`` to the stock of every product below ``threshold``.
+
+    Products are taken in primary-key order, ``chunk_size`` per statement and
+    transaction, so a large catalog never holds a long lock. Each chunk is one
+    ``UPDATE ... RETURNING`` where the backend has it, or else an UPDATE of a
+    ``select_for_update`` snapshot of the chunk's ids. Returns
+    ``{product_pk: new_stock}`` for exactly the products changed.
+    """
+    chunk_size = chunk_size or getattr(settings, 'CRM_RESTOCK_CHUNK_SIZE', 1000)
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    restocked = {}
+    last_pk = 0
+    while True:
+        with transaction.atomic(using=connection.alias):
+            if _can_update_returning(connection):
+                rows = _restock_returning(connection, last_pk, threshold, increment, chunk_size)
+            else:
+                rows = _restock_locked(connection, last_pk, threshold, increment, chunk_size)
+        restocked.update(rows)
+        if len(rows) < chunk_size:
+            return restocked
+        # Keyset on pk, so products still below the threshold are not topped up twice
+        last_pk = max(pk for pk, _ in rows)
+
+
+def _restock_returning(connection, last_pk, threshold, increment, chunk_size):
+    quote = connection.ops.quote_name
+    table, pk, stock = quote(Product._meta.db_table), quote(Product._meta.pk.column), quote('stock')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET {stock} = {stock} + %s "
+            f"WHERE {pk} IN (SELECT {pk} FROM {table} WHERE {pk} > %s AND {stock} < %s ORDER BY {pk} LIMIT %s) "
+            # Rechecked on the row actually updated, in case it changed since the subquery read it
+            f"AND {stock} < %s "
+            f"RETURNING {pk}, {stock}",
+            [increment, last_pk, threshold, chunk_size, threshold],
+        )
+        return cursor.fetchall()
+
+
+def _restock_locked(connection, last_pk, threshold, increment, chunk_size):
+    products = Product.objects.using(connection.alias)
+    snapshot = list(
+        products.select_for_update()
+        .filter(pk__gt=last_pk, stock__lt=threshold)
+        .order_by('pk')
+        .values_list('pk', 'stock')[:chunk_size]
+    )
+    if snapshot:
+        products.filter(pk__in=[pk for pk, _ in snapshot]).update(stock=F('stock') + increment)
+    return [(pk, stock + increment) for pk, stock in snapshot]
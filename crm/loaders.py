@@ -0,0 +1,93 @@
+from collections import defaultdict
+
+from .models import Customer, Order, OrderItem
+
+
+class BatchLoader:
+    """Collects keys and fetches all pending ones in a single query.
+
+    Unlike the promise-based DataLoader this works with graphql-core's
+    synchronous executor: keys are queued up front with ``prime`` (usually
+    for every node of a connection page) and the first ``load`` call for any
+    of them dispatches the whole batch.
+    """
+
+    def __init__(self, batch_load_fn, default=None):
+        self.batch_load_fn = batch_load_fn
+        self.default = default
+        self._cache = {}
+        self._queue = {}
+
+    def prime(self, keys):
+        for key in keys:
+            if key is not None and key not in self._cache:
+                self._queue[key] = None
+
+    def put(self, key, value):
+        self._queue.pop(key, None)
+        self._cache[key] = value
+
+    def load(self, key):
+        if key not in self._cache:
+            self._queue[key] = None
+            self.dispatch()
+        return self._cache[key]
+
+    def dispatch(self):
+        keys = list(self._queue)
+        self._queue.clear()
+        if not keys:
+            return
+        results = self.batch_load_fn(keys)
+        for key in keys:
+            value = results.get(key)
+            if value is None and self.default is not None:
+                value = self.default()
+            self._cache[key] = value
+
+
+def load_customers(customer_ids):
+    return Customer.objects.in_bulk(customer_ids)
+
+
+def load_products_by_order(order_ids):
+    through = Order.products.through
+    products = defaultdict(list)
+    rows = (
+        through.objects.filter(order_id__in=order_ids)
+        .select_related('product')
+        .order_by('order_id', 'product_id')
+    )
+    for row in rows:
+        products[row.order_id].append(row.product)
+    return products
+
+
+def load_items_by_order(order_ids):
+    items = defaultdict(list)
+    rows = OrderItem.objects.filter(order_id__in=order_ids).select_related('product').order_by('order_id', 'product_id')
+    for row in rows:
+        items[row.order_id].append(row)
+    return items
+
+
+class Loaders:
+    """The set of loaders shared by every resolver of one request."""
+
+    def __init__(self):
+        self.customers = BatchLoader(load_customers)
+        self.products_by_order = BatchLoader(load_products_by_order, default=list)
+        self.items_by_order = BatchLoader(load_items_by_order, default=list)
+
+
+def get_loaders(info):
+    context = info.context
+    if context is None:
+        return Loaders()
+    if isinstance(context, dict):
+        return context.setdefault('crm_loaders', Loaders())
+    loaders = getattr(context, 'crm_loaders', None)
+    if loaders is None:
+        loaders = Loaders()
+        context.crm_loaders = loaders
+    return loaders
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from asgiref.sync import ThreadSensitiveContext
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+
+from alx_backend_graphql_crm.schema import schema
+from crm.views import AsyncCRMGraphQLView, CRMGraphQLView
+
+DEFAULT_QUERY = '{ allOrders(first: 10) { edges { node { id totalAmount customer { name } products { name } } } } }'
+
+
+@contextmanager
+def slow_database(delay):
+    """Add ``delay`` seconds to every query, on every thread, like a remote or loaded database."""
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(delay)
+        return execute(sql, params, many, context)
+
+    # Connections are per thread, so every new one gets the wrapper
+    def add_wrapper(sender, connection, **kwargs):
+        connection.execute_wrappers.append(wrapper)
+
+    connections.close_all()
+    connection_created.connect(add_wrapper)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(add_wrapper)
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the same GraphQL query concurrently through the sync view (on a fixed thread pool, "
+        "like a threaded WSGI worker) and the async view (on one event loop), and compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Requests per view (default: 200).")
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help="Requests in flight at once (default: 50).")
+        parser.add_argument('--threads', type=int, default=8,
+                            help="Threads serving the sync view (default: 8).")
+        parser.add_argument('--delay-ms', type=float, default=20.0,
+                            help="Latency added to every SQL query (default: 20).")
+        parser.add_argument('--query', default=DEFAULT_QUERY, help="GraphQL document to send.")
+
+    def handle(self, *args, requests=200, concurrency=50, threads=8, delay_ms=20.0, query=DEFAULT_QUERY, **options):
+        if min(requests, concurrency, threads) < 1:
+            raise CommandError("--requests, --concurrency and --threads must be positive")
+
+        body = {'query': query}
+        # Every request should reach the database
+        with override_settings(CRM_RESPONSE_CACHE={'ENABLED': False}), slow_database(delay_ms / 1000):
+            results = [
+                ('sync', self.run_sync(body, requests, concurrency, threads)),
+                ('async', self.run_async(body, requests, concurrency)),
+            ]
+
+        self.stdout.write(
+            f"{requests} requests, {concurrency} concurrent, {threads} sync threads, +{delay_ms}ms per query\n"
+        )
+        self.stdout.write(f"{'view':<6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'threads':>8}")
+        for name, (wall, latencies, peak_threads) in results:
+            latencies.sort()
+            p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+            self.stdout.write(
+                f"{name:<6} {len(latencies) / wall:>8.1f} {statistics.median(latencies) * 1000:>9.1f} "
+                f"{p95 * 1000:>9.1f} {latencies[-1] * 1000:>9.1f} {peak_threads:>8}"
+            )
+
+    def check_response(self, response):
+        payload = json.loads(response.content)
+        if response.status_code != 200 or payload.get('errors'):
+            raise CommandError(f"Query failed: {payload}")
+
+    def run_sync(self, body, requests, concurrency, threads):
+        view = CRMGraphQLView.as_view(schema=schema)
+        factory = RequestFactory()
+        peak_threads = threading.active_count()
+
+        def serve():
+            nonlocal peak_threads
+            try:
+                self.check_response(view(factory.post('/graphql', body, content_type='application/json')))
+            finally:
+                connections.close_all()
+            peak_threads = max(peak_threads, threading.active_count())
+
+        # Clients wait in line for one of the worker's threads, as they would at a real server
+        with ThreadPoolExecutor(threads) as server, ThreadPoolExecutor(concurrency) as clients:
+            def call(_):
+                start = time.perf_counter()
+                server.submit(serve).result()
+                return time.perf_counter() - start
+
+            start = time.perf_counter()
+            latencies = list(clients.map(call, range(requests)))
+            wall = time.perf_counter() - start
+        # The client threads are the load generator, not the server
+        return wall, latencies, peak_threads - concurrency
+
+    def run_async(self, body, requests, concurrency):
+        view = AsyncCRMGraphQLView.as_view(schema=schema)
+        factory = AsyncRequestFactory()
+        peak_threads = threading.active_count()
+
+        async def call(semaphore):
+            nonlocal peak_threads
+            async with semaphore:
+                start = time.perf_counter()
+                # As Django's ASGIHandler does per request: a request's sync work shares one thread
+                async with ThreadSensitiveContext():
+                    self.check_response(await view(factory.post('/graphql', body, content_type='application/json')))
+                peak_threads = max(peak_threads, threading.active_count())
+                return time.perf_counter() - start
+
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(call(semaphore) for _ in range(requests)))
+
+        start = time.perf_counter()
+        latencies = list(asyncio.run(main()))
+        return time.perf_counter() - start, latencies, peak_threads
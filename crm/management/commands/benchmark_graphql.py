@@ -0,0 +1,109 @@
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from alx_backend_graphql_crm.schema import schema
+from crm.benchmarks import BenchmarkError, compare, get_catalog, load_report, run_catalog, save_report
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the GraphQL catalog in-process against a freshly seeded test database, "
+        "write latency percentiles, SQL counts and peak memory as JSON, and fail on extra SQL "
+        "queries against a stored baseline (and on slower or bigger runs with --check-latency "
+        "and --check-memory)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=1000, help="Seeded customers (default: 1000).")
+        parser.add_argument('--products', type=int, default=100, help="Seeded products (default: 100).")
+        parser.add_argument('--orders', type=int, default=10000, help="Seeded orders (default: 10000).")
+        parser.add_argument('--iterations', type=int, default=50, help="Timed runs per operation (default: 50).")
+        parser.add_argument('--only', action='append', default=[],
+                            help="Run operations whose name starts with this prefix; repeatable.")
+        parser.add_argument('--output', help="Write the JSON report to this file.")
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE),
+                            help="Baseline report to compare against (default: crm/benchmarks/baseline.json).")
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help="Allowed relative growth of median latency and peak memory (default: 0.5).")
+        parser.add_argument('--check-latency', action='store_true',
+                            help="Also gate on median latency; only meaningful on the machine that recorded the baseline.")
+        parser.add_argument('--check-memory', action='store_true',
+                            help="Also gate on peak memory; only meaningful on the Python that recorded the baseline.")
+        parser.add_argument('--update-baseline', action='store_true',
+                            help="Overwrite the baseline with this run instead of comparing.")
+        parser.add_argument('--keepdb', action='store_true', help="Reuse the test database between runs.")
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be positive")
+        if options['tolerance'] < 0:
+            raise CommandError("--tolerance cannot be negative")
+
+        operations = get_catalog(schema)
+        if options['only']:
+            operations = [op for op in operations if op.name.startswith(tuple(options['only']))]
+            if not operations:
+                raise CommandError("--only matched no operation")
+        dataset = {name: options[name] for name in ('customers', 'products', 'orders')}
+
+        baseline = None
+        if not options['update_baseline'] and Path(options['baseline']).exists():
+            baseline = load_report(options['baseline'])
+            if baseline['meta']['dataset'] != dataset:
+                raise CommandError(
+                    f"The baseline was recorded on {baseline['meta']['dataset']}; "
+                    f"run with the same sizes or --update-baseline"
+                )
+
+        # Same environment as the test runner: DEBUG off, throwaway database
+        setup_test_environment(debug=False)
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            call_command(
+                'generate_data', '--flush', '--seed', '0',
+                '--customers', str(dataset['customers']),
+                '--products', str(dataset['products']),
+                '--orders', str(dataset['orders']),
+                stdout=StringIO(),
+            )
+            self.stdout.write(f"{'operation':<36} {'p50':>9} {'p95':>9} {'p99':>9} {'sql':>5} {'peak KiB':>9}")
+            report = run_catalog(
+                schema, operations, iterations=options['iterations'], dataset=dataset, progress=self.progress,
+            )
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        if options['output']:
+            save_report(report, options['output'])
+            self.stdout.write(f"Wrote {options['output']}")
+        if options['update_baseline']:
+            save_report(report, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"Updated baseline {options['baseline']}"))
+            return
+        if baseline is None:
+            self.stdout.write(self.style.WARNING(f"No baseline at {options['baseline']}; nothing to compare."))
+            return
+
+        regressions = compare(
+            report, baseline, options['tolerance'], latency=options['check_latency'], memory=options['check_memory'],
+        )
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(regression)
+            raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}"))
+
+    def progress(self, name, result):
+        self.stdout.write(
+            f"{name:<36} {result['p50_ms']:>7.2f}ms {result['p95_ms']:>7.2f}ms {result['p99_ms']:>7.2f}ms "
+            f"{result['sql_queries']:>5} {result['peak_memory_kib']:>9.1f}"
+        )
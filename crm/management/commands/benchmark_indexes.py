@@ -0,0 +1,105 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from crm.models import Customer, Order, Product
+
+PAGE = 50
+
+
+def access_paths():
+    """(label, queryset) pairs shaped like the filters and order_by of crm.filters, one page each."""
+    orders = Order.objects.aggregate(
+        low=Min('order_date'), high=Max('order_date'), top=Max('total_amount'), customer=Max('customer_id'),
+    )
+    customers = Customer.objects.aggregate(low=Min('created_at'), high=Max('created_at'))
+    products = Product.objects.aggregate(top=Max('price'), product=Max('pk'))
+    if orders['low'] is None or customers['low'] is None or products['product'] is None:
+        raise CommandError("The database has no orders, customers or products to benchmark against.")
+
+    order_midpoint = orders['low'] + (orders['high'] - orders['low']) / 2
+    customer_midpoint = customers['low'] + (customers['high'] - customers['low']) / 2
+    return [
+        ('orders: order_date_gte, order_by orderDate',
+         Order.objects.filter(order_date__gte=order_midpoint).order_by('order_date', 'pk')),
+        ('orders: total_amount_gte, order_by -totalAmount',
+         Order.objects.filter(total_amount__gte=orders['top'] * 9 / 10).order_by('-total_amount', 'pk')),
+        ('orders: one customer, order_by -orderDate',
+         Order.objects.filter(customer_id=orders['customer']).order_by('-order_date')),
+        ('orders: product_id',
+         Order.objects.filter(products__id=products['product']).order_by('pk')),
+        ('customers: created_at_gte, order_by createdAt',
+         Customer.objects.filter(created_at__gte=customer_midpoint).order_by('created_at', 'pk')),
+        ('products: low_stock',
+         Product.objects.filter(stock__lt=10).order_by('pk')),
+        ('products: price_lte, order_by price',
+         Product.objects.filter(price__lte=products['top'] / 10).order_by('price', 'pk')),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the query plan and latency of the filter/sort access paths with the crm indexes, "
+        "and again with them dropped inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20,
+                            help="Timed runs per query; the median is reported (default: 20).")
+        parser.add_argument('--no-plans', action='store_true', help="Only report latencies.")
+
+    def handle(self, *args, repeat=20, no_plans=False, **options):
+        if repeat < 1:
+            raise CommandError("--repeat must be positive")
+        if not connection.features.can_rollback_ddl:
+            raise CommandError(f"{connection.vendor} cannot roll back DROP INDEX; refusing to benchmark.")
+
+        self.stdout.write(
+            f"{Customer.objects.count()} customers, {Product.objects.count()} products, "
+            f"{Order.objects.count()} orders"
+        )
+        paths = access_paths()
+        with_indexes = self.run(paths, repeat, no_plans, "with indexes")
+        with transaction.atomic():
+            self.drop_indexes()
+            without_indexes = self.run(paths, repeat, no_plans, "without indexes")
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.MIGRATE_HEADING("\nMedian latency (ms)"))
+        self.stdout.write(f"{'access path':<48} {'without':>10} {'with':>10} {'speedup':>8}")
+        for label, _ in paths:
+            before, after = without_indexes[label], with_indexes[label]
+            speedup = before / after if after else float('inf')
+            self.stdout.write(f"{label:<48} {before:>10.3f} {after:>10.3f} {speedup:>7.1f}x")
+
+    def drop_indexes(self):
+        # Plain DROP INDEX; SQLite's schema editor refuses to run inside an atomic block
+        with connection.cursor() as cursor:
+            for model in (Customer, Product, Order):
+                for index in model._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+
+    def run(self, paths, repeat, no_plans, heading):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n{heading}"))
+        latencies = {}
+        with connection.cursor() as cursor:
+            for label, queryset in paths:
+                sql, params = queryset[:PAGE].query.sql_with_params()
+                # A per-run comment keeps the driver from reusing a statement (and, on
+                # SQLite, an EXPLAIN) prepared while the indexes existed
+                sql = f'{sql} /* {heading} */'
+                if not no_plans:
+                    cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+                    plan = '\n  '.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+                    self.stdout.write(f"{label}\n  {plan}")
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                    timings.append(time.perf_counter() - start)
+                latencies[label] = statistics.median(timings) * 1000
+        return latencies
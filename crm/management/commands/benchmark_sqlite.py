@@ -0,0 +1,149 @@
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.sqlite import apply_pragmas, get_config
+
+# (name, pragmas, BEGIN statement, persistent connection per thread)
+MODES = [
+    ('default', {}, 'BEGIN', False),
+    ('production, reconnect', None, 'BEGIN IMMEDIATE', False),
+    ('production, persistent', None, 'BEGIN IMMEDIATE', True),
+]
+
+SCHEMA = [
+    "CREATE TABLE product (id INTEGER PRIMARY KEY, stock INTEGER NOT NULL)",
+    "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER NOT NULL, "
+    "total_amount REAL NOT NULL, order_date REAL NOT NULL)",
+    "CREATE INDEX orders_date ON orders (order_date)",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent writer threads (checkout-shaped: read stock, decrement it, insert an order) "
+        "and reader threads (aggregates over recent orders) against a scratch SQLite file, with SQLite's "
+        "defaults and with the CRM_SQLITE production pragmas, and compare throughput and lock errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help="Writer threads (default: 4).")
+        parser.add_argument('--readers', type=int, default=4, help="Reader threads (default: 4).")
+        parser.add_argument('--seconds', type=float, default=5.0, help="Duration of each mode (default: 5).")
+        parser.add_argument('--rows', type=int, default=50000, help="Orders loaded before each run (default: 50000).")
+        parser.add_argument('--timeout', type=float, default=5.0,
+                            help="Seconds a connection waits for a lock in the default mode, "
+                                 "like Django's sqlite3 'timeout' option (default: 5).")
+
+    def handle(self, *args, writers=4, readers=4, seconds=5.0, rows=50000, timeout=5.0, **options):
+        if writers < 1 or seconds <= 0:
+            raise CommandError("--writers and --seconds must be positive")
+        if readers < 0 or rows < 0:
+            raise CommandError("--readers and --rows cannot be negative")
+
+        production = get_config()['PRAGMAS']
+        self.stdout.write(f"{writers} writers, {readers} readers, {seconds:g}s per mode, {rows} orders\n")
+        self.stdout.write(f"{'mode':<24} {'writes/s':>9} {'reads/s':>9} {'locked':>7} {'write p95 ms':>13}")
+        with tempfile.TemporaryDirectory() as directory:
+            for index, (name, pragmas, begin, persistent) in enumerate(MODES):
+                path = Path(directory) / f"mode{index}.sqlite3"
+                pragmas = production if pragmas is None else pragmas
+                self.load(path, pragmas, rows)
+                result = self.run(path, pragmas, begin, persistent, writers, readers, seconds, timeout)
+                self.stdout.write(
+                    f"{name:<24} {result['writes'] / seconds:>9.1f} {result['reads'] / seconds:>9.1f} "
+                    f"{result['locked']:>7} {result['write_p95'] * 1000:>13.1f}"
+                )
+
+    def connect(self, path, pragmas, timeout):
+        # Autocommit at the driver level; transactions are explicit, as in Django
+        connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        apply_pragmas(connection.cursor(), pragmas)
+        return connection
+
+    def load(self, path, pragmas, rows):
+        connection = self.connect(path, pragmas, 5.0)
+        try:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.execute("BEGIN")
+            connection.executemany("INSERT INTO product (id, stock) VALUES (?, ?)", ((pk, 10 ** 9) for pk in range(1, 101)))
+            now = time.time()
+            connection.executemany(
+                "INSERT INTO orders (customer_id, total_amount, order_date) VALUES (?, ?, ?)",
+                ((i % 1000, i % 500 + 0.99, now - i) for i in range(rows)),
+            )
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def run(self, path, pragmas, begin, persistent, writers, readers, seconds, timeout):
+        stop = threading.Event()
+        lock = threading.Lock()
+        result = {'writes': 0, 'reads': 0, 'locked': 0, 'write_latencies': []}
+
+        def worker(operation, counter):
+            rng = random.Random()
+            connection = self.connect(path, pragmas, timeout) if persistent else None
+            done, latencies, locked = 0, [], 0
+            try:
+                while not stop.is_set():
+                    # A new connection per operation, like CONN_MAX_AGE = 0 per request
+                    current = connection or self.connect(path, pragmas, timeout)
+                    start = time.perf_counter()
+                    try:
+                        operation(current, rng)
+                        done += 1
+                        latencies.append(time.perf_counter() - start)
+                    except sqlite3.OperationalError as e:
+                        if 'locked' not in str(e) and 'busy' not in str(e):
+                            raise
+                        locked += 1
+                        if current.in_transaction:
+                            current.execute("ROLLBACK")
+                    finally:
+                        if connection is None:
+                            current.close()
+            finally:
+                if connection is not None:
+                    connection.close()
+            with lock:
+                result[counter] += done
+                result['locked'] += locked
+                if counter == 'writes':
+                    result['write_latencies'] += latencies
+
+        def write(connection, rng):
+            product = rng.randint(1, 100)
+            connection.execute(begin)
+            (stock,) = connection.execute("SELECT stock FROM product WHERE id = ?", (product,)).fetchone()
+            connection.execute("UPDATE product SET stock = ? WHERE id = ?", (stock - 1, product))
+            connection.execute(
+                "INSERT INTO orders (customer_id, total_amount, order_date) VALUES (?, ?, ?)",
+                (rng.randint(0, 999), 9.99, time.time()),
+            )
+            connection.execute("COMMIT")
+
+        def read(connection, rng):
+            connection.execute(
+                "SELECT COUNT(*), SUM(total_amount) FROM orders WHERE order_date >= ?",
+                (time.time() - rng.randint(60, 3600),),
+            ).fetchone()
+
+        threads = [threading.Thread(target=worker, args=(write, 'writes')) for _ in range(writers)]
+        threads += [threading.Thread(target=worker, args=(read, 'reads')) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        latencies = sorted(result['write_latencies']) or [0.0]
+        result['write_p95'] = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+        return result
@@ -0,0 +1,248 @@
+import random
+import time
+from bisect import bisect_right
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from crm.models import Customer, DailyCustomerSales, DailyProductSales, DailySales, Order, OrderItem, Product
+from crm.response_cache import invalidate_models
+from crm.rollups import rebuild_rollups
+from crm.totals import recompute_totals
+from crm.utils import insert_rows
+
+FIRST_NAMES = [
+    'Alice', 'Amina', 'Brian', 'Carol', 'David', 'Esther', 'Farah', 'George', 'Grace', 'Hassan',
+    'Irene', 'James', 'Joy', 'Kevin', 'Lucy', 'Mark', 'Mercy', 'Njeri', 'Omar', 'Peter',
+    'Rose', 'Samuel', 'Tariq', 'Wanjiru', 'Zainab',
+]
+LAST_NAMES = [
+    'Achieng', 'Bello', 'Chen', 'Diallo', 'Garcia', 'Hassan', 'Kamau', 'Kim', 'Mensah', 'Mwangi',
+    'Nakamura', 'Novak', 'Odhiambo', 'Okafor', 'Otieno', 'Patel', 'Rossi', 'Silva', 'Smith', 'Wanjala',
+]
+PRODUCT_ADJECTIVES = ['Basic', 'Classic', 'Compact', 'Deluxe', 'Eco', 'Mini', 'Pro', 'Smart', 'Ultra', 'Wireless']
+PRODUCT_NOUNS = [
+    'Blender', 'Camera', 'Chair', 'Desk', 'Headphones', 'Kettle', 'Keyboard', 'Lamp', 'Laptop', 'Monitor',
+    'Mouse', 'Phone', 'Printer', 'Router', 'Speaker', 'Tablet', 'Watch',
+]
+# Share of orders with 1, 2, 3, ... products
+PRODUCTS_PER_ORDER_WEIGHTS = [45, 25, 14, 8, 5, 3]
+# Share of order items with a quantity of 1, 2, 3, ...
+QUANTITY_WEIGHTS = list(accumulate([80, 12, 5, 3]))
+QUANTITIES = list(range(1, len(QUANTITY_WEIGHTS) + 1))
+
+
+@contextmanager
+def bulk_load_settings():
+    """On SQLite, trade durability for speed while loading: a big page cache and no fsync."""
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        # synchronous cannot change inside a transaction
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA cache_size')
+        cache_size = cursor.fetchone()[0]
+        cursor.execute('PRAGMA synchronous')
+        synchronous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA cache_size = -262144')
+        cursor.execute('PRAGMA synchronous = OFF')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA cache_size = {int(cache_size)}')
+            cursor.execute(f'PRAGMA synchronous = {int(synchronous)}')
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic customers, products and orders with bulk inserts and set-based totals. "
+        "The same --seed and --now always produce the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=1000, help="Customers to create (default: 1000).")
+        parser.add_argument('--products', type=int, default=100, help="Products to create (default: 100).")
+        parser.add_argument('--orders', type=int, default=10000, help="Orders to create (default: 10000).")
+        parser.add_argument('--max-products-per-order', type=int, default=len(PRODUCTS_PER_ORDER_WEIGHTS),
+                            help=f"Largest order (default: {len(PRODUCTS_PER_ORDER_WEIGHTS)}).")
+        parser.add_argument('--days', type=int, default=365,
+                            help="Customers and orders are spread over this many days up to --now (default: 365).")
+        parser.add_argument('--now', help="Date or date and time the data ends at, in ISO 8601 (default: the current time).")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0).")
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help="Rows per INSERT batch and transaction (default: 10000).")
+        parser.add_argument('--flush', action='store_true',
+                            help="Delete all customers, products and orders first (set-based, no cascades).")
+
+    def handle(self, *args, **options):
+        for name in ('customers', 'products', 'orders', 'max_products_per_order', 'days', 'chunk_size'):
+            if options[name] < 0 or (name in ('max_products_per_order', 'days', 'chunk_size') and options[name] < 1):
+                raise CommandError(f"--{name.replace('_', '-')} is out of range")
+        if options['orders'] and not (options['products'] or Product.objects.exists()):
+            raise CommandError("Orders need products; pass --products or load some first")
+        if options['orders'] and not (options['customers'] or Customer.objects.exists()):
+            raise CommandError("Orders need customers; pass --customers or load some first")
+
+        self.verbosity = options['verbosity']
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.now = self.parse_now(options['now'])
+        self.window = timedelta(days=options['days']).total_seconds()
+
+        if options['flush']:
+            self.flush()
+
+        started = time.perf_counter()
+        with bulk_load_settings():
+            self.generate_customers(options['customers'])
+            self.generate_products(options['products'])
+            self.generate_orders(options['orders'], options['max_products_per_order'])
+        self.reset_sequences()
+        if options['orders']:
+            rows = rebuild_rollups()
+            self.stdout.write("Rebuilt sales rollups: {} days, {} customer-days, {} product-days.".format(*rows))
+        invalidate_models(Customer, Product, Order)
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - started:.1f}s."))
+
+    def parse_now(self, value):
+        if value is None:
+            return timezone.now()
+        now = parse_datetime(value)
+        if now is None and (day := parse_date(value)) is not None:
+            now = datetime.combine(day, datetime.min.time())
+        if now is None:
+            raise CommandError(f"--now {value!r} is not an ISO 8601 date or date and time")
+        return now if timezone.is_aware(now) else timezone.make_aware(now)
+
+    def flush(self):
+        tables = [model._meta.db_table for model in (
+            DailyProductSales, DailyCustomerSales, DailySales, OrderItem, Order, Product, Customer,
+        )]
+        with transaction.atomic(), connection.cursor() as cursor:
+            for sql in connection.ops.sql_flush(no_style(), tables, allow_cascade=True):
+                cursor.execute(sql)
+        self.stdout.write("Flushed customers, products and orders.")
+
+    def reset_sequences(self):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [
+                Customer, Product, Order, OrderItem, DailySales, DailyCustomerSales, DailyProductSales,
+            ]):
+                cursor.execute(sql)
+
+    def progress(self, label, done, total, started):
+        rate = done / max(time.perf_counter() - started, 1e-9)
+        self.stdout.write(f"  {label}: {done}/{total} ({done * 100 // total}%, {rate:,.0f} rows/s)")
+
+    def insert(self, label, model, total, make_rows):
+        """Bulk-insert ``total`` rows built by ``make_rows(first_pk, count)`` in chunked transactions."""
+        if not total:
+            return
+        first_pk = (model.objects.aggregate(high=Max('pk'))['high'] or 0) + 1
+        started = time.perf_counter()
+        # About ten progress lines per table
+        report_every = max(total // 10, 1)
+        next_report = report_every
+        for offset in range(0, total, self.chunk_size):
+            count = min(self.chunk_size, total - offset)
+            with transaction.atomic():
+                make_rows(first_pk + offset, count)
+            done = offset + count
+            if done >= next_report or done == total or self.verbosity > 1:
+                self.progress(label, done, total, started)
+                next_report = done + report_every
+
+    def generate_customers(self, total):
+        rng = self.rng
+        adapt_datetime = connection.ops.adapt_datetimefield_value
+
+        def make_rows(first_pk, count):
+            # Raw inserts, so created_at keeps the generated date rather than auto_now_add's
+            customers = []
+            for pk in range(first_pk, first_pk + count):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                customers.append((
+                    pk,
+                    f"{first} {last}",
+                    f"{first}.{last}.{pk}@example.com".lower(),
+                    f"+2547{rng.randrange(10 ** 8):08d}" if rng.random() < 0.7 else None,
+                    adapt_datetime(self.now - timedelta(seconds=rng.random() * self.window)),
+                ))
+            insert_rows(Customer, ['id', 'name', 'email', 'phone', 'created_at'], customers)
+
+        self.insert("customers", Customer, total, make_rows)
+
+    def generate_products(self, total):
+        rng = self.rng
+
+        def make_rows(first_pk, count):
+            Product.objects.bulk_create([
+                Product(
+                    pk=pk,
+                    name=f"{rng.choice(PRODUCT_ADJECTIVES)} {rng.choice(PRODUCT_NOUNS)} {pk}",
+                    # Mostly cheap items, a long tail of expensive ones
+                    price=Decimal(min(rng.lognormvariate(3.5, 1.0), 99999)).quantize(Decimal('0.01')) + Decimal('1.00'),
+                    stock=rng.randrange(0, 500),
+                )
+                for pk in range(first_pk, first_pk + count)
+            ], batch_size=self.chunk_size)
+
+        self.insert("products", Product, total, make_rows)
+
+    def generate_orders(self, total, max_products):
+        if not total:
+            return
+        rng = self.rng
+        customers = list(Customer.objects.order_by('created_at', 'pk').values_list('pk', 'created_at'))
+        created = [created_at.timestamp() for _, created_at in customers]
+        adapt_decimal = connection.ops.adapt_decimalfield_value
+        prices = {pk: adapt_decimal(price, 10, 2) for pk, price in Product.objects.values_list('pk', 'price')}
+        product_ids = sorted(prices)
+        # Zipf-like popularity: a few products and customers account for most orders
+        rng.shuffle(product_ids)
+        product_weights = list(accumulate(1 / rank for rank in range(1, len(product_ids) + 1)))
+        customer_ranks = list(range(1, len(customers) + 1))
+        rng.shuffle(customer_ranks)
+        customer_weights = list(accumulate(1 / rank ** 0.5 for rank in customer_ranks))
+        sizes = list(range(1, max_products + 1))
+        size_weights = list(accumulate((PRODUCTS_PER_ORDER_WEIGHTS + [1] * max_products)[:max_products]))
+        adapt_datetime = connection.ops.adapt_datetimefield_value
+        start = self.now.timestamp() - self.window
+        step = self.window / total
+        first_order = None
+
+        def make_rows(first_pk, count):
+            nonlocal first_order
+            if first_order is None:
+                first_order = first_pk
+            orders = []
+            items = []
+            for pk in range(first_pk, first_pk + count):
+                # Dates grow with the pk as in production, so index inserts append
+                timestamp = start + (pk - first_order + rng.random()) * step
+                # Only customers who already signed up, weighted by popularity
+                signed_up = max(bisect_right(created, timestamp), 1)
+                index = bisect_right(customer_weights, rng.random() * customer_weights[signed_up - 1], hi=signed_up - 1)
+                customer_id = customers[index][0]
+                order_date = datetime.fromtimestamp(max(timestamp, created[index]), tz=dt_timezone.utc)
+                orders.append((pk, customer_id, adapt_datetime(order_date), 0))
+                size = min(rng.choices(sizes, cum_weights=size_weights)[0], len(product_ids))
+                chosen = set(rng.choices(product_ids, cum_weights=product_weights, k=size))
+                items.extend(
+                    (pk, product_id, rng.choices(QUANTITIES, cum_weights=QUANTITY_WEIGHTS)[0], prices[product_id])
+                    for product_id in chosen
+                )
+            insert_rows(Order, ['id', 'customer_id', 'order_date', 'total_amount'], orders)
+            insert_rows(OrderItem, ['order_id', 'product_id', 'quantity', 'unit_price'], items)
+            recompute_totals(Order.objects.filter(pk__gte=first_pk, pk__lt=first_pk + count))
+
+        self.insert("orders", Order, total, make_rows)
@@ -0,0 +1,38 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.models import Order
+from crm.response_cache import invalidate_models
+from crm.rollups import rebuild_rollups
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"{value!r} is not a YYYY-MM-DD date")
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill or rebuild the daily sales rollups (totals, per product and per customer) from the orders. "
+        "Without --from/--to every day is rebuilt."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help="First day to rebuild, YYYY-MM-DD (default: the first order).")
+        parser.add_argument('--to', dest='date_to', help="Last day to rebuild, YYYY-MM-DD (default: the last order).")
+
+    def handle(self, *args, date_from=None, date_to=None, **options):
+        date_from = _date(date_from) if date_from else None
+        date_to = _date(date_to) if date_to else None
+        if date_from and date_to and date_from > date_to:
+            raise CommandError("--from is after --to")
+
+        day_rows, customer_rows, product_rows = rebuild_rollups(date_from, date_to)
+        # salesTimeSeries responses are cached under the Order tag
+        invalidate_models(Order)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {day_rows} day, {customer_rows} customer-day and {product_rows} product-day rollups."
+        ))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min
+
+from crm.models import Order
+from crm.totals import mismatched_totals, recompute_totals
+
+
+class Command(BaseCommand):
+    help = "Recompute (or with --verify, check) Order.total_amount for all orders in primary-key chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help="Only report orders whose stored total is wrong; change nothing.")
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help="Number of primary keys handled per UPDATE (default: 10000).")
+
+    def handle(self, *args, verify=False, chunk_size=10000, **options):
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        bounds = Order.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            self.stdout.write("No orders found.")
+            return
+
+        processed = 0
+        for start in range(bounds['low'], bounds['high'] + 1, chunk_size):
+            chunk = Order.objects.filter(pk__gte=start, pk__lt=start + chunk_size)
+            if verify:
+                for order_id in mismatched_totals(chunk).values_list('pk', flat=True):
+                    self.stdout.write(f"Order {order_id}: stored total does not match its items")
+                    processed += 1
+            else:
+                with transaction.atomic():
+                    processed += recompute_totals(chunk)
+
+        if verify:
+            if processed:
+                raise CommandError(f"{processed} orders have incorrect totals")
+            self.stdout.write(self.style.SUCCESS("All order totals are correct."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Recomputed totals for {processed} orders."))
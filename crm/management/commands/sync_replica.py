@@ -0,0 +1,33 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from crm.routing import get_replica_alias
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into the replica file (CRM_REPLICA_DB), "
+        "standing in for replication when trying the replica router locally."
+    )
+
+    def handle(self, *args, **options):
+        replica = get_replica_alias()
+        if replica is None:
+            raise CommandError("No replica configured; set CRM_REPLICA_DB to a SQLite file")
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite' or connections[replica].vendor != 'sqlite':
+            raise CommandError("sync_replica only copies SQLite files; real replicas follow the primary themselves")
+
+        # The online backup API gives a consistent copy while the primary is in use
+        connections[replica].close()
+        primary.ensure_connection()
+        target = sqlite3.connect(connections[replica].settings_dict['NAME'])
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"Copied {primary.settings_dict['NAME']} to {connections[replica].settings_dict['NAME']}."
+        ))
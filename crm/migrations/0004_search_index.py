@@ -0,0 +1,81 @@
+from django.db import migrations
+
+# Columns indexed for full-text search, per table
+SEARCH_COLUMNS = {
+    'crm_customer': ('name', 'email'),
+    'crm_product': ('name',),
+}
+
+
+def sqlite_fts5_available(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def sqlite_statements(table, columns):
+    fts = f'{table}_fts'
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    # External-content FTS5 table: the index only, rows are read from the table itself
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({column_list}, content='{table}', content_rowid='id')",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        # Only edits to indexed columns touch the index (stock updates do not)
+        f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {column_list} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def postgresql_statements(table, columns):
+    # Emails are split on punctuation so every part can be searched by prefix
+    document = " || ' ' || ".join(
+        f"regexp_replace(coalesce({column}, ''), '\\W+', ' ', 'g')" for column in columns
+    )
+    return [
+        f"ALTER TABLE {table} ADD COLUMN search_vector tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('simple', {document})) STORED",
+        f"CREATE INDEX {table}_search_idx ON {table} USING GIN (search_vector)",
+    ]
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    for table, columns in SEARCH_COLUMNS.items():
+        if connection.vendor == 'sqlite' and sqlite_fts5_available(connection):
+            statements = sqlite_statements(table, columns)
+        elif connection.vendor == 'postgresql':
+            statements = postgresql_statements(table, columns)
+        else:
+            # crm.search falls back to icontains
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    for table in SEARCH_COLUMNS:
+        if connection.vendor == 'sqlite':
+            for suffix in ('insert', 'delete', 'update'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}_fts')
+        elif connection.vendor == 'postgresql':
+            schema_editor.execute(f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0003_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,16 +1,22 @@
 from django.db import models
 import re
 
+PHONE_PATTERN = re.compile(r'^\+?\d{1,4}?[-.\s]?\d{3}[-.\s]?\d{3}[-.\s]?\d{4}$')
+
 class Customer(models.Model):
     name = models.CharField(max_length=255)
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)  # Added for filtering
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='crm_customer_created_idx'),
+        ]
+
     def clean(self):
         if self.phone:
-            phone_pattern = re.compile(r'^\+?\d{1,4}?[-.\s]?\d{3}[-.\s]?\d{3}[-.\s]?\d{4}$')
-            if not phone_pattern.match(self.phone):
+            if not PHONE_PATTERN.match(self.phone):
                 raise ValueError("Invalid phone format. Use formats like +1234567890 or 123-456-7890.")
 
     def __str__(self):
@@ -21,6 +27,12 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.IntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['stock'], name='crm_product_stock_idx'),
+            models.Index(fields=['price'], name='crm_product_price_idx'),
+        ]
+
     def clean(self):
         if self.price <= 0:
             raise ValueError("Price must be positive.")
@@ -32,15 +44,85 @@ class Product(models.Model):
 
 class Order(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='orders')
-    products = models.ManyToManyField(Product, related_name='orders')
+    products = models.ManyToManyField(Product, related_name='orders', through='OrderItem')
     order_date = models.DateTimeField(auto_now_add=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        if self.products.exists():
-            self.total_amount = sum(product.price for product in self.products.all())
-            super().save(update_fields=['total_amount'])
+    class Meta:
+        # The m2m table already indexes product_id (as it does every FK column),
+        # which serves the product filters
+        indexes = [
+            models.Index(fields=['order_date'], name='crm_order_date_idx'),
+            models.Index(fields=['total_amount'], name='crm_order_total_idx'),
+            models.Index(fields=['customer', 'order_date'], name='crm_order_customer_date_idx'),
+        ]
 
     def __str__(self):
-        return f"Order {self.id} by {self.customer.name}"
\ No newline at end of file
+        return f"Order {self.id} by {self.customer.name}"
+
+class OrderItem(models.Model):
+    """A product on an order, with the quantity and the price it was sold at.
+
+    ``unit_price`` is a snapshot, so later price changes leave the order's
+    total alone. Rows added through ``Order.products`` get the product's
+    current price from the m2m_changed handler in signals.py.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='order_items')
+    quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+
+    class Meta:
+        # The table of the former auto-created m2m through model
+        db_table = 'crm_order_products'
+        unique_together = [('order', 'product')]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} on order {self.order_id}"
+
+class JobWatermark(models.Model):
+    """How far a recurring job has got, so the next run starts after it."""
+    name = models.CharField(max_length=100, unique=True)
+    # Opaque position, e.g. the keyset cursor of the last order processed
+    cursor = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+class DailySales(models.Model):
+    """Orders and revenue of one day (in TIME_ZONE), kept by crm.rollups."""
+    day = models.DateField(unique=True)
+    order_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+class DailyProductSales(models.Model):
+    """Orders, units and revenue of one product on one day (in TIME_ZONE), kept by crm.rollups."""
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    order_count = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='crm_daily_product_sales_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='crm_daily_product_day_idx'),
+        ]
+
+class DailyCustomerSales(models.Model):
+    """Orders and revenue of one customer on one day (in TIME_ZONE), kept by crm.rollups."""
+    day = models.DateField()
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='daily_sales')
+    order_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'day'], name='crm_daily_customer_sales_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='crm_daily_customer_day_idx'),
+        ]
@@ -0,0 +1,165 @@
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from graphene.relay import PageInfo
+from graphene.utils.str_converters import to_snake_case
+from graphql import GraphQLError
+
+from .search import RANK_ORDERING
+
+KEYSET_CURSOR_PREFIX = 'keyset:'
+
+
+def apply_order_by(queryset, order_by):
+    """Order by a comma separated list of fields, accepting camelCase names and a ``-`` prefix."""
+    if not order_by:
+        return queryset
+    return queryset.order_by(*[to_snake_case(name.strip()) for name in order_by.split(',') if name.strip()])
+
+
+def ordering_keys(queryset):
+    """Return ``[(field, descending), ...]`` for the queryset's ordering, ending with the pk.
+
+    Search relevance is not a stable sort key, so a search's default
+    ordering by rank gives way to the model's ordering.
+    """
+    model = queryset.model
+    ordering = list(queryset.query.order_by)
+    if not ordering or tuple(ordering) == RANK_ORDERING:
+        ordering = list(model._meta.ordering)
+    keys = []
+    for item in ordering:
+        if not isinstance(item, str):
+            raise GraphQLError("Keyset pagination only supports ordering by field names")
+        descending = item.startswith('-')
+        name = to_snake_case(item.lstrip('-+'))
+        if name in ('pk', model._meta.pk.name):
+            break
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise GraphQLError(f"Cannot order by '{name}'")
+        if not field.concrete or field.null or field.many_to_many or field.one_to_many:
+            raise GraphQLError(f"Keyset pagination cannot order by '{name}'")
+        keys.append((field.attname, descending))
+    # The primary key makes the ordering total, so every row has a unique position
+    keys.append(('pk', keys[-1][1] if keys else False))
+    return keys
+
+
+def encode_cursor(node, keys):
+    values = [getattr(node, name) for name, _ in keys]
+    payload = json.dumps([[name for name, _ in keys], values], default=_cursor_value)
+    return KEYSET_CURSOR_PREFIX + base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _cursor_value(value):
+    # Full precision: DjangoJSONEncoder drops microseconds, which would break the seek
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def decode_cursor(cursor, keys, model):
+    try:
+        if not cursor.startswith(KEYSET_CURSOR_PREFIX):
+            raise ValueError
+        names, values = json.loads(base64.urlsafe_b64decode(cursor[len(KEYSET_CURSOR_PREFIX):]))
+    except (TypeError, ValueError):
+        raise GraphQLError("Invalid keyset cursor")
+    if names != [name for name, _ in keys]:
+        raise GraphQLError("Cursor does not match the requested ordering")
+    try:
+        return [
+            model._meta.pk.to_python(value) if name == 'pk' else _field(model, name).to_python(value)
+            for name, value in zip(names, values)
+        ]
+    except ValidationError:
+        raise GraphQLError("Invalid keyset cursor")
+
+
+def _field(model, attname):
+    for field in model._meta.concrete_fields:
+        if field.attname == attname:
+            return field
+    raise GraphQLError("Invalid keyset cursor")
+
+
+def seek(keys, values, forward=True):
+    """``WHERE (k1, .., pk) > (v1, .., id)`` expanded to cover mixed sort directions.
+
+    The leading ``k1 >= v1`` bound is redundant but lets the database turn the
+    condition into an index range scan on ``(k1, id)``.
+    """
+    condition = Q()
+    equal = Q()
+    for (name, descending), value in zip(keys, values):
+        lookup = 'gt' if descending != forward else 'lt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    name, descending = keys[0]
+    bound = 'gte' if descending != forward else 'lte'
+    return Q(**{f'{name}__{bound}': values[0]}) & condition
+
+
+def order_fields(keys, forward=True):
+    return [
+        f"{'-' if descending == forward else ''}{name}" for name, descending in keys
+    ]
+
+
+def load_fields(queryset, keys):
+    """Make sure the sort key columns are loaded when the planner narrowed the query with only()."""
+    names, defer = queryset.query.deferred_loading
+    if defer or not names:
+        return queryset
+    return queryset.only(*names, *[name for name, _ in keys])
+
+
+def resolve_keyset_connection(connection, args, queryset, max_limit=None):
+    """Build a relay connection page by seeking past the cursor instead of using OFFSET."""
+    if args.get('offset'):
+        raise GraphQLError("offset cannot be combined with keyset pagination")
+
+    model = queryset.model
+    keys = ordering_keys(queryset)
+    after, before = args.get('after'), args.get('before')
+    first, last = args.get('first'), args.get('last')
+    if first is None and last is None:
+        first = max_limit
+
+    queryset = load_fields(queryset, keys)
+    if after:
+        queryset = queryset.filter(seek(keys, decode_cursor(after, keys, model), forward=True))
+    if before:
+        queryset = queryset.filter(seek(keys, decode_cursor(before, keys, model), forward=False))
+
+    if first is None:
+        # Only `last`: read the page backwards from the end and flip it
+        nodes = list(queryset.order_by(*order_fields(keys, forward=False))[:last + 1])
+        has_previous_page = len(nodes) > last
+        nodes = nodes[:last][::-1]
+        has_next_page = bool(before)
+    else:
+        nodes = list(queryset.order_by(*order_fields(keys))[:first + 1])
+        has_next_page = len(nodes) > first
+        nodes = nodes[:first]
+        has_previous_page = bool(after)
+        if last is not None and len(nodes) > last:
+            nodes = nodes[-last:]
+            has_previous_page = True
+
+    edges = [connection.Edge(node=node, cursor=encode_cursor(node, keys)) for node in nodes]
+    result = connection(
+        edges=edges,
+        page_info=PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=has_previous_page,
+            has_next_page=has_next_page,
+        ),
+    )
+    result.iterable = queryset
+    return result
@@ -0,0 +1,91 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+
+def collect_fields(info, selection_set, fields=None):
+    """Map each selected field name (snake_case) to its field nodes, following fragments."""
+    if fields is None:
+        fields = {}
+    if selection_set is None:
+        return fields
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            fields.setdefault(to_snake_case(selection.name.value), []).append(selection)
+        elif isinstance(selection, InlineFragmentNode):
+            collect_fields(info, selection.selection_set, fields)
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = info.fragments.get(selection.name.value)
+            if fragment is not None:
+                collect_fields(info, fragment.selection_set, fields)
+    return fields
+
+
+def sub_fields(info, field_nodes):
+    fields = {}
+    for node in field_nodes:
+        collect_fields(info, node.selection_set, fields)
+    return fields
+
+
+def node_fields(info):
+    """Return the fields selected on ``edges.node`` of the connection being resolved."""
+    edges = sub_fields(info, info.field_nodes).get('edges', [])
+    nodes = sub_fields(info, edges).get('node', [])
+    return sub_fields(info, nodes)
+
+
+def plan_queryset(queryset, info):
+    """Restrict a connection queryset to the columns and relations the query asks for.
+
+    Forward foreign keys are joined with ``select_related``, many-to-many and
+    reverse relations are fetched with one ``prefetch_related`` query per level,
+    and every level is narrowed with ``only`` so unused columns stay unloaded.
+    """
+    only, select, prefetch = _plan(info, queryset.model, node_fields(info))
+    queryset = queryset.only(*only)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+def _plan(info, model, fields, prefix=''):
+    only = [prefix + model._meta.pk.name]
+    select = []
+    prefetch = []
+    for name, field_nodes in fields.items():
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if not field.is_relation:
+            if field.concrete:
+                only.append(prefix + field.name)
+            continue
+
+        selections = sub_fields(info, field_nodes)
+        related_model = field.related_model
+        if field.many_to_one or (field.one_to_one and field.concrete):
+            select.append(prefix + field.name)
+            only.append(prefix + field.name)
+            related_only, related_select, related_prefetch = _plan(
+                info, related_model, selections, prefix + field.name + '__'
+            )
+            only.extend(related_only)
+            select.extend(related_select)
+            prefetch.extend(related_prefetch)
+        else:
+            related_only, related_select, related_prefetch = _plan(info, related_model, selections)
+            if field.one_to_many:
+                # The reverse foreign key column is needed to attach rows to their parent.
+                related_only.append(field.field.name)
+            related = related_model._default_manager.only(*related_only)
+            if related_select:
+                related = related.select_related(*related_select)
+            if related_prefetch:
+                related = related.prefetch_related(*related_prefetch)
+            prefetch.append(Prefetch(prefix + field.name, queryset=related))
+    return only, select, prefetch
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .graphql_client import execute_query
+from .models import JobWatermark
+
+WATERMARK = 'order_reminders'
+
+DEFAULTS = {
+    # Orders older than this are never reminded about
+    'WINDOW_DAYS': 7,
+    # Orders per GraphQL page, at most the connection limit (RELAY_CONNECTION_MAX_LIMIT)
+    'PAGE_SIZE': 100,
+    # Reminders per Celery task
+    'BATCH_SIZE': 100,
+}
+
+# Oldest first, so the last cursor of a run is where the next one resumes
+ORDERS_QUERY = """
+    query OrderReminders($since: DateTime!, $first: Int!, $after: String) {
+        allOrders(keyset: true, orderBy: "orderDate", orderDateGte: $since, first: $first, after: $after) {
+            edges {
+                node {
+                    id
+                    customer { id email }
+                }
+            }
+            pageInfo { hasNextPage endCursor }
+        }
+    }
+"""
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CRM_ORDER_REMINDERS', {})}
+
+
+def order_pages(since, after=None, page_size=100):
+    """Yield ``(edges, end_cursor)`` for each page of orders placed since ``since``, after ``after``."""
+    while True:
+        connection = execute_query(ORDERS_QUERY, {'since': since.isoformat(), 'first': page_size, 'after': after})['allOrders']
+        if connection['edges']:
+            yield connection['edges'], connection['pageInfo']['endCursor']
+        if not connection['pageInfo']['hasNextPage']:
+            return
+        after = connection['pageInfo']['endCursor']
+
+
+def send_order_reminders(config=None):
+    """Queue one reminder per customer with an order newer than the last run.
+
+    Orders are read a page at a time and each page's reminders go out as a
+    Celery group of chunks, ``BATCH_SIZE`` reminders per task. The watermark
+    advances after every dispatched page, so a failed run resumes where it
+    stopped and memory holds one page plus the customers already reminded.
+    Returns the number of reminders queued.
+    """
+    from .tasks import send_order_reminder
+
+    config = config or get_config()
+    since = timezone.now() - timedelta(days=config['WINDOW_DAYS'])
+    watermark = JobWatermark.objects.filter(name=WATERMARK).values_list('cursor', flat=True).first()
+    reminded = set()
+    queued = 0
+    for edges, end_cursor in order_pages(since, watermark, config['PAGE_SIZE']):
+        reminders = []
+        for edge in edges:
+            order = edge['node']
+            customer = order['customer']
+            if customer['id'] not in reminded:
+                reminded.add(customer['id'])
+                reminders.append((customer['email'], order['id']))
+        if reminders:
+            send_order_reminder.chunks(reminders, config['BATCH_SIZE']).group().apply_async()
+        queued += len(reminders)
+        JobWatermark.objects.update_or_create(name=WATERMARK, defaults={'cursor': end_cursor})
+    return queued
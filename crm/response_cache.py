@@ -0,0 +1,193 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+
+# Tags are model names; a cached response depends on the tags of its root fields
+ALL_TAGS = ('Customer', 'Product', 'Order')
+ROOT_FIELD_TAGS = {
+    'hello': (),
+    'allCustomers': ('Customer',),
+    'allProducts': ('Product',),
+    'allOrders': ('Order', 'Customer', 'Product'),
+    'crmStats': ('Customer', 'Order'),
+    # Rollups follow order creation; product deletes cascade to them
+    'salesTimeSeries': ('Order', 'Product'),
+}
+
+DEFAULTS = {
+    # Off unless enabled: a 'local' store misses other processes' invalidations,
+    # so deployments with several processes need 'django' and a shared cache
+    'ENABLED': False,
+    'STORE': 'local',
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    'MAX_ENTRIES': 1000,
+}
+
+
+class LocalMemoryStore:
+    """Per-process LRU store with expiry; the default.
+
+    Invalidations only reach the process that made them, so it is only
+    correct when one process serves and writes the data.
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_many(self, keys):
+        return {key: value for key in keys if (value := self.get(key)) is not None}
+
+    def incr(self, key):
+        with self._lock:
+            value, expires = self._entries.get(key, (0, None))
+            self._entries[key] = (value + 1, expires)
+            return value + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoCacheStore:
+    """Store backed by a Django cache alias (e.g. Redis), shared by every worker."""
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, timeout=None):
+        self.cache.set(key, value, timeout=timeout)
+
+    def get_many(self, keys):
+        return self.cache.get_many(keys)
+
+    def incr(self, key):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # add() keeps a concurrent first increment from being lost
+            if self.cache.add(key, 1, timeout=None):
+                return 1
+            return self.cache.incr(key)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class ResponseCache:
+    """Caches read-only GraphQL results, invalidated by bumping per-model tag versions.
+
+    The cache key covers the query hash, operation name, variables, the viewer
+    and the current version of every tag the operation reads, so bumping a
+    tag makes every dependent entry unreachable without having to find it.
+    """
+
+    key_prefix = 'crm:response:'
+
+    def __init__(self, store, timeout=300):
+        self.store = store
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def tags_for(self, root_fields):
+        tags = set()
+        for name in root_fields:
+            tags.update(ROOT_FIELD_TAGS.get(name, ALL_TAGS))
+        return sorted(tags)
+
+    def key(self, query_hash, operation_name, variables, viewer, tags):
+        version_keys = [self.key_prefix + 'tag:' + tag for tag in tags]
+        versions = self.store.get_many(version_keys)
+        payload = json.dumps(
+            [query_hash, operation_name, variables, viewer, [versions.get(key, 0) for key in version_keys]],
+            sort_keys=True,
+            default=str,
+        )
+        return self.key_prefix + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        value = self.store.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.store.set(key, value, self.timeout)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.store.incr(self.key_prefix + 'tag:' + tag)
+        self.invalidations += 1
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations}
+
+
+_response_cache = None
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CRM_RESPONSE_CACHE', {})}
+
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        config = get_config()
+        if config['STORE'] == 'django':
+            store = DjangoCacheStore(config['CACHE_ALIAS'])
+        else:
+            store = LocalMemoryStore(config['MAX_ENTRIES'])
+        _response_cache = ResponseCache(store, config['TIMEOUT'])
+    return _response_cache
+
+
+@receiver(setting_changed)
+def reset_response_cache(setting, **kwargs):
+    """Rebuild the cache from the new settings next time, e.g. under override_settings."""
+    global _response_cache
+    if setting == 'CRM_RESPONSE_CACHE':
+        _response_cache = None
+
+
+def invalidate_models(*models):
+    """Invalidate cached responses reading ``models`` once the current transaction commits."""
+    tags = [model.__name__ for model in models]
+    transaction.on_commit(lambda: get_response_cache().invalidate(*tags))
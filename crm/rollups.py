@@ -0,0 +1,164 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyCustomerSales, DailyProductSales, DailySales, Order, OrderItem
+from .totals import item_amount
+from .utils import chunked
+
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+BATCH_SIZE = 1000
+
+
+def record_orders(orders, using=None):
+    """Add new orders to the daily rollups.
+
+    ``orders`` is a list of ``(order, items)`` pairs, as just created. Each
+    rollup table gets one upsert statement that increments existing rows, so
+    concurrent checkouts on the same day do not overwrite each other. Call
+    inside the transaction that creates the orders.
+    """
+    record_sales((
+        (order.order_date, order.customer_id, order.total_amount,
+         [(item.product_id, item.quantity, item.unit_price) for item in items])
+        for order, items in orders
+    ), using)
+
+
+def record_sales(sales, using=None):
+    """record_orders() for plain tuples, where no model instances were built.
+
+    ``sales`` yields ``(order_date, customer_id, total_amount, items)`` with
+    ``items`` a list of ``(product_id, quantity, unit_price)``.
+    """
+    days = defaultdict(lambda: [0, ZERO])
+    customers = defaultdict(lambda: [0, ZERO])
+    products = defaultdict(lambda: [0, 0, ZERO])
+    # Bulk imports share one order_date
+    local_days = {}
+    for order_date, customer_id, total_amount, items in sales:
+        day = local_days.get(order_date)
+        if day is None:
+            day = local_days[order_date] = timezone.localdate(order_date)
+        for totals in (days[day,], customers[day, customer_id]):
+            totals[0] += 1
+            totals[1] += total_amount
+        for product_id, quantity, unit_price in items:
+            product = products[day, product_id]
+            product[0] += 1
+            product[1] += quantity
+            product[2] += quantity * unit_price
+
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    _increment(connection, DailySales, ['day'], ['order_count', 'revenue'], days)
+    _increment(connection, DailyCustomerSales, ['day', 'customer_id'], ['order_count', 'revenue'], customers)
+    _increment(connection, DailyProductSales, ['day', 'product_id'], ['order_count', 'quantity', 'revenue'], products)
+
+
+def _increment(connection, model, keys, counters, rows):
+    # rows: {(day, *other keys): [*counters]}, revenue last
+    if not rows:
+        return
+    if not connection.features.supports_update_conflicts_with_target:
+        _increment_one_by_one(connection, model, keys, counters, rows)
+        return
+
+    ops = connection.ops
+    quote = ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = keys + counters
+    placeholders = '({})'.format(', '.join(['%s'] * len(columns)))
+    revenue = model._meta.get_field('revenue')
+    rows = list(rows.items())
+    # Within the backend's limit on query parameters (999 on SQLite)
+    fields = [model._meta.get_field(column) for column in columns]
+    batch_size = max(min(ops.bulk_batch_size(fields, rows), BATCH_SIZE), 1)
+    for batch in chunked(rows, batch_size):
+        params = []
+        for (day, *key), values in batch:
+            params += [
+                ops.adapt_datefield_value(day), *key, *values[:-1],
+                ops.adapt_decimalfield_value(values[-1], revenue.max_digits, revenue.decimal_places),
+            ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(quote(column) for column in columns)}) "
+                f"VALUES {', '.join([placeholders] * len(batch))} "
+                f"ON CONFLICT ({', '.join(quote(column) for column in keys)}) DO UPDATE SET "
+                + ', '.join(f"{quote(column)} = {table}.{quote(column)} + excluded.{quote(column)}" for column in counters),
+                params,
+            )
+
+
+def _increment_one_by_one(connection, model, keys, counters, rows):
+    # Backends without ON CONFLICT ... DO UPDATE: update, else insert
+    manager = model.objects.using(connection.alias)
+    for key, values in rows.items():
+        lookup = dict(zip(keys, key))
+        increments = {column: F(column) + value for column, value in zip(counters, values)}
+        if not manager.filter(**lookup).update(**increments):
+            try:
+                with transaction.atomic(using=connection.alias):
+                    manager.create(**lookup, **dict(zip(counters, values)))
+            except IntegrityError:
+                manager.filter(**lookup).update(**increments)
+
+
+def rebuild_rollups(date_from=None, date_to=None, using=None):
+    """Recompute the rollups of the days from ``date_from`` to ``date_to`` (inclusive) from the orders.
+
+    Existing rows of those days are replaced, inside one transaction. Each
+    table is refilled from one GROUP BY query, streamed in batches. Returns
+    ``(day_rows, customer_rows, product_rows)``.
+    """
+    using = using or DEFAULT_DB_ALIAS
+    orders = Order.objects.using(using).annotate(day=TruncDate('order_date'))
+    items = OrderItem.objects.using(using).annotate(day=TruncDate('order__order_date'))
+    days = {}
+    if date_from is not None:
+        days['day__gte'] = date_from
+    if date_to is not None:
+        days['day__lte'] = date_to
+    orders, items = orders.filter(**days), items.filter(**days)
+
+    with transaction.atomic(using=using):
+        for model in (DailySales, DailyCustomerSales, DailyProductSales):
+            model.objects.using(using).filter(**days).delete()
+        day_rows = _bulk_insert(DailySales, using, (
+            DailySales(day=row['day'], order_count=row['order_count'], revenue=row['revenue'])
+            for row in orders.values('day')
+            .annotate(order_count=Count('pk'), revenue=Sum('total_amount'))
+            .order_by().iterator(chunk_size=BATCH_SIZE)
+        ))
+        customer_rows = _bulk_insert(DailyCustomerSales, using, (
+            DailyCustomerSales(day=row['day'], customer_id=row['customer_id'],
+                               order_count=row['order_count'], revenue=row['revenue'])
+            for row in orders.values('day', 'customer_id')
+            .annotate(order_count=Count('pk'), revenue=Sum('total_amount'))
+            .order_by().iterator(chunk_size=BATCH_SIZE)
+        ))
+        product_rows = _bulk_insert(DailyProductSales, using, (
+            DailyProductSales(day=row['day'], product_id=row['product_id'], order_count=row['order_count'],
+                              quantity=row['units'], revenue=row['revenue'])
+            for row in items.values('day', 'product_id')
+            # Not named quantity, which item_amount() reads
+            .annotate(order_count=Count('order_id'), units=Sum('quantity'), revenue=Sum(item_amount()))
+            .order_by().iterator(chunk_size=BATCH_SIZE)
+        ))
+    return day_rows, customer_rows, product_rows
+
+
+def _bulk_insert(model, using, instances):
+    count = 0
+    for batch in chunked(instances, BATCH_SIZE):
+        for instance in batch:
+            # SQLite sums decimals as floats
+            instance.revenue = Decimal(instance.revenue or 0).quantize(CENT)
+        model.objects.using(using).bulk_create(batch)
+        count += len(batch)
+    return count
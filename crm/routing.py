@@ -0,0 +1,134 @@
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+DEFAULTS = {
+    # Alias of the read replica in DATABASES; without it every read goes to the primary
+    'REPLICA': 'replica',
+    # How long a client reads from the primary after writing, to cover replication lag
+    'STICKY_SECONDS': 10,
+    'COOKIE': 'crm_read_primary',
+}
+
+# The routing state of the current request, or None outside requests
+_state = ContextVar('crm_db_routing', default=None)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CRM_DB_ROUTING', {})}
+
+
+def get_replica_alias():
+    """The configured replica alias, or None when there is no replica."""
+    replica = get_config()['REPLICA']
+    return replica if replica and replica in settings.DATABASES else None
+
+
+class RoutingState:
+    """Where one request's reads go.
+
+    Reads use the replica only once ``use_replica`` allows it (GraphQL
+    queries) and never after the request, or a recent one from the same
+    client, wrote something.
+    """
+
+    def __init__(self, sticky=False):
+        self.replica = False
+        # The client wrote recently (it sent the sticky cookie)
+        self.sticky = sticky
+        self.wrote = False
+
+    def use_replica(self, allowed=True):
+        self.replica = allowed
+
+
+def get_routing_state():
+    return _state.get()
+
+
+class ReplicaRouter:
+    """Send reads to the replica where the request allows it, everything else to the primary.
+
+    Reads inside ``transaction.atomic`` stay on the primary, so a transaction
+    sees its own writes and locks hold. Outside requests (cron jobs, Celery,
+    management commands) nothing is routed and Django's defaults apply.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None:
+            return None
+        if not state.replica or state.sticky or state.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return get_replica_alias() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # Later reads of this request, and of the client for a while, see the write
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Called on every foreign key assignment, so the common case stays cheap
+        if obj1._state.db == obj2._state.db:
+            return True
+        databases = {DEFAULT_DB_ALIAS, get_replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        if db == get_replica_alias():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Scope the routing state to the request and make clients that wrote sticky to the primary.
+
+    A response to a request that wrote sets a short-lived cookie; while the
+    client sends it back every read goes to the primary, so it reads its own
+    writes even when the replica lags.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Under ASGI the chain stays async, so no thread is held per request
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.start(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state = self.start(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    def start(self, request):
+        return RoutingState(sticky=get_config()['COOKIE'] in request.COOKIES)
+
+    def finish(self, state, response):
+        if state.wrote and get_replica_alias() is not None:
+            config = get_config()
+            response.set_cookie(config['COOKIE'], '1', max_age=config['STICKY_SECONDS'], httponly=True, samesite='Lax')
+        return response
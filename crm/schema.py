@@ -1,12 +1,26 @@
+from collections import defaultdict
+
 import graphene
+from graphene_django import DjangoListField
 from graphene_django.types import DjangoObjectType
-from graphene_django.filter import DjangoFilterConnectionField
-from django.db import transaction, IntegrityError
-from .models import Customer, Product, Order
+from django.conf import settings
+from django.utils import timezone
+from django.db import connection, transaction, IntegrityError
+from .models import Customer, Product, Order, OrderItem, PHONE_PATTERN
 from .filters import CustomerFilter, ProductFilter, OrderFilter
 from django.core.exceptions import ValidationError
 from crm.models import Product 
-from django.db.models import F
+from .fields import CRMFilterConnectionField
+from .inventory import InsufficientStock, reserve_stock, restock
+from .loaders import get_loaders
+from .pagination import apply_order_by
+from .planner import plan_queryset
+from .response_cache import invalidate_models
+from .rollups import record_orders, record_sales
+from .stats import crm_stats, sales_time_series
+from .utils import chunked, insert_rows
+
+BULK_CREATE_BATCH_SIZE = 1000
 
 
 # Django Object Types
@@ -24,13 +38,51 @@ class ProductType(DjangoObjectType):
         filterset_class = ProductFilter
         interfaces = (graphene.relay.Node,)
 
+class OrderItemType(DjangoObjectType):
+    class Meta:
+        model = OrderItem
+        fields = ('product', 'quantity', 'unit_price')
+
 class OrderType(DjangoObjectType):
+    # A plain list rather than a connection, as ProductType is a relay node
+    products = DjangoListField(ProductType, required=True)
+    items = DjangoListField(OrderItemType, required=True)
+
     class Meta:
         model = Order
-        fields = ('id', 'customer', 'products', 'order_date', 'total_amount')
+        fields = ('id', 'customer', 'products', 'items', 'order_date', 'total_amount')
         filterset_class = OrderFilter
         interfaces = (graphene.relay.Node,)
 
+    @classmethod
+    def prime_loaders(cls, info, orders):
+        loaders = get_loaders(info)
+        for order in orders:
+            # Relations already fetched by the query planner need no batching
+            if not Order.customer.is_cached(order) and 'customer_id' not in order.get_deferred_fields():
+                loaders.customers.prime([order.customer_id])
+            prefetched = getattr(order, '_prefetched_objects_cache', {})
+            if 'products' not in prefetched:
+                loaders.products_by_order.prime([order.pk])
+            if 'items' not in prefetched:
+                loaders.items_by_order.prime([order.pk])
+
+    def resolve_customer(self, info):
+        # Already joined by the query planner
+        if Order.customer.is_cached(self):
+            return self.customer
+        return get_loaders(info).customers.load(self.customer_id)
+
+    def resolve_products(self, info):
+        if 'products' in getattr(self, '_prefetched_objects_cache', {}):
+            return self.products.all()
+        return get_loaders(info).products_by_order.load(self.pk)
+
+    def resolve_items(self, info):
+        if 'items' in getattr(self, '_prefetched_objects_cache', {}):
+            return self.items.all()
+        return get_loaders(info).items_by_order.load(self.pk)
+
 # Input Types for Mutations
 class CustomerInput(graphene.InputObjectType):
     name = graphene.String(required=True)
@@ -42,9 +94,15 @@ class ProductInput(graphene.InputObjectType):
     price = graphene.Decimal(required=True)
     stock = graphene.Int(required=False, default_value=0)
 
+class OrderItemInput(graphene.InputObjectType):
+    product_id = graphene.ID(required=True)
+    quantity = graphene.Int(required=False, default_value=1)
+
 class OrderInput(graphene.InputObjectType):
     customer_id = graphene.ID(required=True)
-    product_ids = graphene.List(graphene.ID, required=True)
+    # One of each product; use items for quantities
+    product_ids = graphene.List(graphene.ID, required=False)
+    items = graphene.List(graphene.NonNull(OrderItemInput), required=False)
     order_date = graphene.DateTime(required=False)
 
 # Input Types for Filters
@@ -54,6 +112,7 @@ class CustomerFilterInput(graphene.InputObjectType):
     created_at_gte = graphene.DateTime()
     created_at_lte = graphene.DateTime()
     phone_pattern = graphene.String()
+    search = graphene.String()
 
 class ProductFilterInput(graphene.InputObjectType):
     name_icontains = graphene.String()
@@ -62,6 +121,7 @@ class ProductFilterInput(graphene.InputObjectType):
     stock_gte = graphene.Int()
     stock_lte = graphene.Int()
     low_stock = graphene.Boolean()
+    search = graphene.String()
 
 class OrderFilterInput(graphene.InputObjectType):
     total_amount_gte = graphene.Decimal()
@@ -71,6 +131,7 @@ class OrderFilterInput(graphene.InputObjectType):
     customer_name = graphene.String()
     product_name = graphene.String()
     product_id = graphene.ID()
+    search = graphene.String()
 
 # Mutations
 class CreateCustomer(graphene.Mutation):
@@ -83,8 +144,7 @@ class CreateCustomer(graphene.Mutation):
     def mutate(self, info, input):
         try:
             if input.phone:
-                phone_pattern = re.compile(r'^\+?\d{1,4}?[-.\s]?\d{3}[-.\s]?\d{3}[-.\s]?\d{4}$')
-                if not phone_pattern.match(input.phone):
+                if not PHONE_PATTERN.match(input.phone):
                     raise ValidationError("Invalid phone format. Use formats like +1234567890 or 123-456-7890.")
 
             customer = Customer(name=input.name, email=input.email, phone=input.phone)
@@ -104,31 +164,48 @@ class BulkCreateCustomers(graphene.Mutation):
     errors = graphene.List(graphene.String)
 
     def mutate(self, info, input):
-        customers = []
         errors = []
+        candidates = []
+
+        # Validate every row in memory; uniqueness is checked set-wise below
+        for i, customer_input in enumerate(input):
+            if customer_input.phone and not PHONE_PATTERN.match(customer_input.phone):
+                errors.append((i, "Invalid phone format"))
+                continue
+
+            customer = Customer(
+                name=customer_input.name,
+                email=customer_input.email,
+                phone=customer_input.phone
+            )
+            try:
+                customer.full_clean(validate_unique=False)
+            except ValidationError as e:
+                errors.append((i, str(e)))
+                continue
+            candidates.append((i, customer))
+
+        # One email__in probe (chunked only where the backend caps query parameters)
+        emails = [customer.email for _, customer in candidates]
+        existing = set()
+        for batch in chunked(emails, connection.ops.bulk_batch_size(['email'], emails) or 1):
+            existing.update(Customer.objects.filter(email__in=batch).values_list('email', flat=True))
+
+        customers = []
+        for i, customer in candidates:
+            if customer.email in existing:
+                errors.append((i, f"Email {customer.email} already exists"))
+                continue
+            existing.add(customer.email)
+            customers.append(customer)
 
         with transaction.atomic():
-            for i, customer_input in enumerate(input):
-                try:
-                    if customer_input.phone:
-                        phone_pattern = re.compile(r'^\+?\d{1,4}?[-.\s]?\d{3}[-.\s]?\d{3}[-.\s]?\d{4}$')
-                        if not phone_pattern.match(customer_input.phone):
-                            errors.append(f"Customer {i+1}: Invalid phone format")
-                            continue
-
-                    customer = Customer(
-                        name=customer_input.name,
-                        email=customer_input.email,
-                        phone=customer_input.phone
-                    )
-                    customer.full_clean()
-                    customer.save()
-                    customers.append(customer)
-                except IntegrityError:
-                    errors.append(f"Customer {i+1}: Email {customer_input.email} already exists")
-                except ValidationError as e:
-                    errors.append(f"Customer {i+1}: {str(e)}")
+            Customer.objects.bulk_create(customers, batch_size=BULK_CREATE_BATCH_SIZE)
+        if customers:
+            # bulk_create sends no post_save, so invalidate cached reads here
+            invalidate_models(Customer)
 
+        errors = [f"Customer {i+1}: {message}" for i, message in sorted(errors, key=lambda error: error[0])]
         return BulkCreateCustomers(customers=customers, errors=errors)
 
 class CreateProduct(graphene.Mutation):
@@ -146,6 +223,33 @@ class CreateProduct(graphene.Mutation):
         except ValidationError as e:
             raise ValidationError(str(e))
 
+def _order_quantities(order_input):
+    """{product id as sent: quantity} for an OrderInput, merging product_ids and items."""
+    quantities = dict.fromkeys((str(product_id) for product_id in order_input.product_ids or ()), 1)
+    for item in order_input.items or ():
+        if item.quantity is None or item.quantity < 1:
+            raise ValidationError(f"Quantity for product {item.product_id} must be positive")
+        product_id = str(item.product_id)
+        quantities[product_id] = quantities.get(product_id, 0) + item.quantity
+    if not quantities:
+        raise ValidationError("At least one product must be selected")
+    return quantities
+
+def _missing_products(product_ids, products):
+    """ValidationError for the ids in ``product_ids`` not in ``products`` (from in_bulk), or None."""
+    missing = [pid for pid in product_ids if not pid.isdigit() or int(pid) not in products]
+    if len(missing) == 1:
+        return ValidationError(f"Product with ID {missing[0]} does not exist")
+    if missing:
+        return ValidationError(f"Products with IDs {', '.join(missing)} do not exist")
+    return None
+
+def _insufficient_stock(shortages, products):
+    return ValidationError("Insufficient stock for " + ", ".join(
+        f"{products[pk].name} (requested {requested}, available {available})"
+        for pk, (requested, available) in shortages.items()
+    ))
+
 class CreateOrder(graphene.Mutation):
     class Arguments:
         input = OrderInput(required=True)
@@ -155,52 +259,277 @@ class CreateOrder(graphene.Mutation):
     def mutate(self, info, input):
         try:
             customer = Customer.objects.get(id=input.customer_id)
-        except Customer.DoesNotExist:
+        except (Customer.DoesNotExist, ValueError):
             raise ValidationError(f"Customer with ID {input.customer_id} does not exist")
 
-        if not input.product_ids:
-            raise ValidationError("At least one product must be selected")
+        quantities = _order_quantities(input)
+
+        # One lookup for every product; all unknown ids are reported together
+        product_ids = list(quantities)
+        products = Product.objects.in_bulk([pid for pid in product_ids if pid.isdigit()])
+        error = _missing_products(product_ids, products)
+        if error:
+            raise error
+        products = [products[int(pid)] for pid in product_ids]
+        quantities = {product.pk: quantities[str(product.pk)] for product in products}
 
-        products = []
-        for product_id in input.product_ids:
+        with transaction.atomic():
             try:
-                product = Product.objects.get(id=product_id)
-                products.append(product)
-            except Product.DoesNotExist:
-                raise ValidationError(f"Product with ID {product_id} does not exist")
-
-        order = Order(customer=customer)
-        order.save()
-        order.products.set(products)
-        order.save()
+                reserve_stock(quantities)
+            except InsufficientStock as e:
+                raise _insufficient_stock(e.shortages, {product.pk: product for product in products})
+            # Prices are snapshotted as loaded above
+            order = Order(
+                customer=customer,
+                total_amount=sum(product.price * quantities[product.pk] for product in products),
+            )
+            order.save()
+            items = OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=quantities[product.pk], unit_price=product.price)
+                for product in products
+            ])
+            record_orders([(order, items)])
+        # update() sends no post_save, so invalidate cached stock here
+        invalidate_models(Product)
+        for product in products:
+            product.stock -= quantities[product.pk]
+
+        # The response can be served from what is already loaded
+        loaders = get_loaders(info)
+        loaders.products_by_order.put(order.pk, products)
+        loaders.items_by_order.put(order.pk, items)
         return CreateOrder(order=order)
 
+def _allocate_stock(requests, available):
+    """Split ``requests`` ([(i, {product_pk: quantity})]) into those the stock covers, in order, and the rest.
+
+    Returns ``(accepted, rejected)``; ``rejected`` maps ``i`` to the
+    shortages ``{product_pk: (requested, available)}`` that refused it.
+    """
+    remaining = dict(available)
+    accepted, rejected = [], {}
+    for i, quantities in requests:
+        shortages = {
+            pk: (quantity, remaining[pk]) for pk, quantity in quantities.items() if remaining[pk] < quantity
+        }
+        if shortages:
+            rejected[i] = shortages
+            continue
+        for pk, quantity in quantities.items():
+            remaining[pk] -= quantity
+        accepted.append((i, quantities))
+    return accepted, rejected
+
+def _created_orders(loaders, created, order_date, products):
+    # Lazy, so instances are only built if the response asks for the orders
+    for pk, (customer, total, quantities) in created:
+        order = Order(pk=pk, customer=customer, order_date=order_date, total_amount=total)
+        items = [
+            OrderItem(order_id=pk, product=products[product_pk], quantity=quantity, unit_price=products[product_pk].price)
+            for product_pk, quantity in quantities.items()
+        ]
+        # The response can be served from what is already loaded
+        loaders.products_by_order.put(pk, [item.product for item in items])
+        loaders.items_by_order.put(pk, items)
+        yield order
+
+class BulkCreateOrders(graphene.Mutation):
+    class Arguments:
+        input = graphene.List(graphene.NonNull(OrderInput), required=True)
+
+    orders = graphene.List(OrderType)
+    errors = graphene.List(graphene.String)
+
+    def mutate(self, info, input):
+        errors = []
+        requests = []
+        for i, order_input in enumerate(input):
+            try:
+                requests.append((i, order_input.customer_id, _order_quantities(order_input)))
+            except ValidationError as e:
+                errors.append((i, e.message))
+
+        # Two in_bulk lookups for the whole feed (batched by the backend's parameter limit)
+        customers = Customer.objects.in_bulk({
+            str(customer_id) for _, customer_id, _ in requests if str(customer_id).isdigit()
+        })
+        products = Product.objects.in_bulk({
+            pid for _, _, quantities in requests for pid in quantities if pid.isdigit()
+        })
+
+        valid = []
+        for i, customer_id, quantities in requests:
+            customer_id = str(customer_id)
+            if not customer_id.isdigit() or int(customer_id) not in customers:
+                errors.append((i, f"Customer with ID {customer_id} does not exist"))
+                continue
+            error = _missing_products(list(quantities), products)
+            if error:
+                errors.append((i, error.message))
+                continue
+            valid.append((i, customers[int(customer_id)], {int(pid): quantity for pid, quantity in quantities.items()}))
+
+        customer_of = {i: customer for i, customer, _ in valid}
+        available = {pk: product.stock for pk, product in products.items()}
+        with transaction.atomic():
+            while True:
+                # Orders are taken in input order while the stock read above lasts
+                accepted, rejected = _allocate_stock([(i, quantities) for i, _, quantities in valid], available)
+                totals = defaultdict(int)
+                for _, quantities in accepted:
+                    for pk, quantity in quantities.items():
+                        totals[pk] += quantity
+                try:
+                    # One conditional UPDATE for every product; no order can oversell
+                    reserve_stock(totals)
+                    break
+                except InsufficientStock as e:
+                    # Stock sold concurrently since it was read; allocate again with what is left
+                    available.update({pk: shortage[1] for pk, shortage in e.shortages.items()})
+
+            # Totals from the same snapshot prices as the items, so no UPDATE is needed afterwards
+            order_date = timezone.now()
+            created = [
+                (customer_of[i], sum(products[pk].price * quantity for pk, quantity in quantities.items()), quantities)
+                for i, quantities in accepted
+            ]
+            # Plain rows rather than model instances: those would cost more than the inserts
+            adapt_decimal = connection.ops.adapt_decimalfield_value
+            adapted_date = connection.ops.adapt_datetimefield_value(order_date)
+            order_rows = [(customer.pk, adapted_date, adapt_decimal(total, 10, 2)) for customer, total, _ in created]
+            columns = ['customer_id', 'order_date', 'total_amount']
+            if connection.features.can_return_rows_from_bulk_insert:
+                order_ids = insert_rows(Order, columns, order_rows, returning='id')
+            else:
+                # Without RETURNING the new ids are unknown, and the items need them
+                order_ids = [
+                    Order.objects.create(customer=customer, total_amount=total).pk for customer, total, _ in created
+                ]
+                # auto_now_add stamps each save with its own time; use the date the rollups and response use
+                for batch in chunked(order_ids, connection.ops.bulk_batch_size(['id'], order_ids) or 1):
+                    Order.objects.filter(pk__in=batch).update(order_date=order_date)
+            prices = {pk: adapt_decimal(product.price, 10, 2) for pk, product in products.items()}
+            insert_rows(OrderItem, ['order_id', 'product_id', 'quantity', 'unit_price'], (
+                (order_id, pk, quantity, prices[pk])
+                for order_id, (_, _, quantities) in zip(order_ids, created)
+                for pk, quantity in quantities.items()
+            ))
+            record_sales(
+                (order_date, customer.pk, total, [(pk, quantity, products[pk].price) for pk, quantity in quantities.items()])
+                for customer, total, quantities in created
+            )
+        if created:
+            # Raw inserts and update() send no signals, so invalidate cached reads here
+            invalidate_models(Order, Product)
+            for pk, quantity in totals.items():
+                products[pk].stock -= quantity
+
+        for i, shortages in rejected.items():
+            errors.append((i, _insufficient_stock(shortages, products).message))
+
+        errors = [f"Order {i+1}: {message}" for i, message in sorted(errors, key=lambda error: error[0])]
+        orders = _created_orders(get_loaders(info), zip(order_ids, created), order_date, products)
+        return BulkCreateOrders(orders=orders, errors=errors)
+
+def _products_by_pk(pks):
+    # Lazy, so the products are only read if the response asks for them
+    for batch in chunked(sorted(pks), getattr(settings, 'CRM_RESTOCK_CHUNK_SIZE', 1000)):
+        yield from Product.objects.filter(pk__in=batch).order_by('pk')
+
+class UpdateLowStockProducts(graphene.Mutation):
+    class Arguments:
+        threshold = graphene.Int(required=False, default_value=10)
+        increment = graphene.Int(required=False, default_value=10)
+
+    updated_products = graphene.List(ProductType)
+    updated_count = graphene.Int()
+    message = graphene.String()
+
+    def mutate(self, info, threshold, increment):
+        if increment < 1:
+            raise ValidationError("Increment must be positive")
+
+        # Only the products actually changed, each with its new stock
+        restocked = restock(threshold, increment)
+        if restocked:
+            # update() sends no post_save, so invalidate cached reads here
+            invalidate_models(Product)
+
+        return UpdateLowStockProducts(
+            updated_products=_products_by_pk(restocked),
+            updated_count=len(restocked),
+            message=f"Updated {len(restocked)} low-stock products",
+        )
+
 # Query Class with Filtering
+class StatsGranularity(graphene.Enum):
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+
+class CRMStatsPeriodType(graphene.ObjectType):
+    period = graphene.Date(required=True)
+    order_count = graphene.Int(required=True)
+    revenue = graphene.Decimal(required=True)
+
+class CRMStatsType(graphene.ObjectType):
+    customer_count = graphene.Int(required=True)
+    order_count = graphene.Int(required=True)
+    revenue = graphene.Decimal(required=True)
+    periods = graphene.List(graphene.NonNull(CRMStatsPeriodType), required=True)
+
+class SalesPeriodType(graphene.ObjectType):
+    period = graphene.Date(required=True)
+    order_count = graphene.Int(required=True)
+    revenue = graphene.Decimal(required=True)
+    # Units sold; only for a product's series
+    quantity = graphene.Int()
+
 class Query(graphene.ObjectType):
-    all_customers = DjangoFilterConnectionField(CustomerType, filterset_class=CustomerFilter, order_by=graphene.String())
-    all_products = DjangoFilterConnectionField(ProductType, filterset_class=ProductFilter, order_by=graphene.String())
-    all_orders = DjangoFilterConnectionField(OrderType, filterset_class=OrderFilter, order_by=graphene.String())
+    crm_stats = graphene.Field(
+        CRMStatsType,
+        required=True,
+        date_from=graphene.DateTime(),
+        date_to=graphene.DateTime(),
+        granularity=StatsGranularity(),
+    )
+    sales_time_series = graphene.List(
+        graphene.NonNull(SalesPeriodType),
+        required=True,
+        date_from=graphene.Date(),
+        date_to=graphene.Date(),
+        granularity=StatsGranularity(default_value='day'),
+        product_id=graphene.ID(),
+        customer_id=graphene.ID(),
+    )
+    all_customers = CRMFilterConnectionField(CustomerType, filterset_class=CustomerFilter, order_by=graphene.String(), keyset=True)
+    all_products = CRMFilterConnectionField(ProductType, filterset_class=ProductFilter, order_by=graphene.String())
+    all_orders = CRMFilterConnectionField(OrderType, filterset_class=OrderFilter, order_by=graphene.String(), keyset=True)
+
+    def resolve_crm_stats(self, info, date_from=None, date_to=None, granularity=None):
+        return crm_stats(date_from, date_to, granularity.value if granularity else None)
+
+    def resolve_sales_time_series(self, info, granularity, date_from=None, date_to=None, product_id=None, customer_id=None):
+        if product_id is not None and customer_id is not None:
+            raise ValidationError("Filter by a product or a customer, not both")
+        for value in (product_id, customer_id):
+            if value is not None and not str(value).isdigit():
+                raise ValidationError(f"Invalid ID {value}")
+        return sales_time_series(
+            date_from, date_to, getattr(granularity, 'value', granularity), product_id=product_id, customer_id=customer_id,
+        )
 
     def resolve_all_customers(self, info, **kwargs):
-        queryset = Customer.objects.all()
-        order_by = kwargs.get('order_by')
-        if order_by:
-            queryset = queryset.order_by(order_by)
-        return queryset
+        queryset = plan_queryset(Customer.objects.all(), info)
+        return apply_order_by(queryset, kwargs.get('order_by'))
 
     def resolve_all_products(self, info, **kwargs):
-        queryset = Product.objects.all()
-        order_by = kwargs.get('order_by')
-        if order_by:
-            queryset = queryset.order_by(order_by)
-        return queryset
+        queryset = plan_queryset(Product.objects.all(), info)
+        return apply_order_by(queryset, kwargs.get('order_by'))
 
     def resolve_all_orders(self, info, **kwargs):
-        queryset = Order.objects.all()
-        order_by = kwargs.get('order_by')
-        if order_by:
-            queryset = queryset.order_by(order_by)
-        return queryset
+        queryset = plan_queryset(Order.objects.all(), info)
+        return apply_order_by(queryset, kwargs.get('order_by'))
 
 # Mutation Class
 class Mutation(graphene.ObjectType):
@@ -208,43 +537,7 @@ class Mutation(graphene.ObjectType):
     bulk_create_customers = BulkCreateCustomers.Field()
     create_product = CreateProduct.Field()
     create_order = CreateOrder.Field()
-
-
-
-# Define Product type
-class ProductType(DjangoObjectType):
-    class Meta:
-        model = Product
-        fields = ('id', 'name', 'stock')
-
-# Define mutation
-class UpdateLowStockProducts(graphene.Mutation):
-    class Arguments:
-        pass  # No input arguments needed
-
-    updated_products = graphene.List(ProductType)
-    message = graphene.String()
-
-    def mutate(self, info):
-        # Query products with stock < 10
-        low_stock_products = Product.objects.filter(stock__lt=10)
-        
-        # Update stock by incrementing by 10
-        low_stock_products.update(stock=F('stock') + 10)
-        
-        # Fetch updated products for response
-        updated_products = Product.objects.filter(id__in=low_stock_products.values('id'))
-        
-        # Create success message
-        message = f"Updated {low_stock_products.count()} low-stock products"
-        
-        return UpdateLowStockProducts(
-            updated_products=updated_products,
-            message=message
-        )
-
-# Update Query class to include the mutation
-class Mutation(graphene.ObjectType):
+    bulk_create_orders = BulkCreateOrders.Field()
     update_low_stock_products = UpdateLowStockProducts.Field()
 
 # Update schema
@@ -0,0 +1,114 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Customer, Order, Product
+
+# Columns covered by the full-text index of each model (see migration 0004)
+SEARCH_FIELDS = {
+    Customer: ('name', 'email'),
+    Product: ('name',),
+}
+
+# Default ordering of ranked results
+RANK_ORDERING = ('-search_rank', 'pk')
+
+# Name matches outrank email matches
+SQLITE_WEIGHTS = {
+    Customer: (10.0, 1.0),
+    Product: (1.0,),
+}
+
+
+def search_terms(text):
+    return re.findall(r'\w+', text or '')
+
+
+def _has_table(connection, name):
+    with connection.cursor() as cursor:
+        return name in connection.introspection.table_names(cursor)
+
+
+_backends = {}
+
+
+def _backend(model, connection):
+    # SQLite builds without FTS5 skip the index in the migration
+    key = (connection.alias, model)
+    if key not in _backends:
+        table = model._meta.db_table
+        if connection.vendor == 'sqlite' and _has_table(connection, f'{table}_fts'):
+            _backends[key] = 'fts5'
+        elif connection.vendor == 'postgresql':
+            _backends[key] = 'tsvector'
+        else:
+            _backends[key] = None
+    return _backends[key]
+
+
+def search(queryset, text, rank=True):
+    """Restrict ``queryset`` (customers or products) to rows matching every term of ``text``.
+
+    Each term matches a word prefix, so "ann exa" finds "Ann" <ann@example.com>.
+    Uses FTS5 on SQLite and the tsvector column on PostgreSQL, falling back
+    to ``icontains`` elsewhere. With ``rank`` the results are annotated with
+    ``search_rank`` and, unless the queryset is already ordered, sorted by it.
+    """
+    model = queryset.model
+    terms = search_terms(text)
+    if not terms:
+        return queryset.none()
+
+    connection = connections[queryset.db]
+    backend = _backend(model, connection)
+    table = connection.ops.quote_name(model._meta.db_table)
+    if backend == 'fts5':
+        fts = f'{model._meta.db_table}_fts'
+        match = ' '.join(f'"{term}"*' for term in terms)
+        queryset = queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [match]))
+        if not rank:
+            return queryset
+        # bm25 only works in the MATCH query, so it is computed once for all
+        # matches in a derived table (LIMIT keeps SQLite from flattening it
+        # into a MATCH per row, which is quadratic) and looked up by rowid
+        weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS[model])
+        queryset = queryset.annotate(search_rank=RawSQL(
+            # bm25 is lower for better matches, so it is negated
+            f'SELECT score FROM (SELECT rowid AS id, -bm25({fts}, {weights}) AS score '
+            f'FROM {fts} WHERE {fts} MATCH %s LIMIT -1) WHERE id = {table}.id',
+            [match], output_field=FloatField(),
+        ))
+    elif backend == 'tsvector':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        queryset = queryset.alias(
+            search_match=RawSQL(
+                f"{table}.search_vector @@ to_tsquery('simple', %s)", [tsquery], output_field=BooleanField()
+            ),
+        ).filter(search_match=True)
+        if rank:
+            queryset = queryset.annotate(search_rank=RawSQL(
+                f"ts_rank({table}.search_vector, to_tsquery('simple', %s))", [tsquery], output_field=FloatField()
+            ))
+    else:
+        for term in terms:
+            queryset = queryset.filter(
+                Q.create([(f'{field}__icontains', term) for field in SEARCH_FIELDS[model]], connector=Q.OR)
+            )
+        return queryset
+
+    if rank and not queryset.query.order_by:
+        queryset = queryset.order_by(*RANK_ORDERING)
+    return queryset
+
+
+def search_orders(queryset, text):
+    """Orders whose customer or any of whose products match ``text``."""
+    customers = search(Customer.objects.using(queryset.db), text, rank=False)
+    products = search(Product.objects.using(queryset.db), text, rank=False)
+    # Both sides are index lookups: Order.customer_id and the m2m table's product_id
+    ordered_products = Order.products.through.objects.filter(product_id__in=products.values('pk'))
+    return queryset.filter(
+        Q(customer_id__in=customers.values('pk')) | Q(pk__in=ordered_products.values('order_id'))
+    )
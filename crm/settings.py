@@ -44,6 +44,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'crm.routing.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'alx_backend_graphql_crm.urls'
@@ -73,9 +74,40 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Seconds a connection is kept open between requests, per thread (0: close after each request)
+        'CONN_MAX_AGE': int(os.environ.get('CRM_CONN_MAX_AGE', '0')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Production SQLite: WAL and tuned pragmas (crm.sqlite.DEFAULTS) on every new
+# connection, and transactions that take the write lock up front, so concurrent
+# writers wait on busy_timeout instead of failing with "database is locked".
+# A 'PRAGMAS' dict here, or in a DATABASES entry, overrides single pragmas.
+CRM_SQLITE = {
+    'ENABLED': os.environ.get('CRM_SQLITE_PRODUCTION', '0') == '1',
+}
+if CRM_SQLITE['ENABLED']:
+    DATABASES['default']['OPTIONS'] = {'transaction_mode': 'IMMEDIATE'}
+
+# Optional read replica. CRM_REPLICA_DB names a second SQLite file standing in
+# for one locally (copy the primary into it with `manage.py sync_replica`)
+if os.environ.get('CRM_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['CRM_REPLICA_DB'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# GraphQL queries read from REPLICA; mutations, transactions and clients that
+# wrote in the last STICKY_SECONDS (tracked by COOKIE) use the primary
+DATABASE_ROUTERS = ['crm.routing.ReplicaRouter']
+CRM_DB_ROUTING = {
+    'REPLICA': 'replica',
+    'STICKY_SECONDS': 10,
+    'COOKIE': 'crm_read_primary',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -118,6 +150,66 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Report the SQL query count of every GraphQL operation (log + response extensions)
+CRM_QUERY_DEBUG = False
+
+# Parsed + validated GraphQL documents kept in memory (LRU), and the cache
+# alias holding persisted query texts by their sha256 hash
+CRM_DOCUMENT_CACHE_SIZE = 256
+CRM_PERSISTED_QUERY_CACHE = 'default'
+
+# Cache of read-only GraphQL results, invalidated per model by the mutations.
+# STORE is 'local' (per process) or 'django' (the CACHE_ALIAS cache, e.g. Redis).
+# A 'local' store only sees the invalidations of its own process, so with more
+# than one web worker, or with cron/Celery jobs writing, use 'django' with a
+# cache backend every process shares; otherwise reads stay stale until TIMEOUT
+CRM_RESPONSE_CACHE = {
+    'ENABLED': os.environ.get('CRM_RESPONSE_CACHE', '0') == '1',
+    'STORE': os.environ.get('CRM_RESPONSE_CACHE_STORE', 'local'),
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Static query cost budget, checked before execution. Cost counts the objects an
+# operation can resolve: connection pages by first/last, plain lists by LIST_FAN_OUT
+CRM_QUERY_COST = {
+    'ENABLED': True,
+    'MAX_COST': 10000,
+    'MAX_DEPTH': 10,
+    'LIST_FAN_OUT': 10,
+}
+
+# Per-resolver timing and SQL tracing. Requests sending the HEADER get an
+# Apollo-tracing payload in extensions; SAMPLE_RATE of the rest are traced
+# silently and logged to 'crm.tracing' when slower than SLOW_OPERATION_MS
+CRM_TRACING = {
+    'HEADER': 'X-CRM-Trace',
+    'SAMPLE_RATE': 0.0,
+    'SLOW_OPERATION_MS': 500,
+}
+
+# How Celery tasks and cron jobs run GraphQL documents: 'inprocess' executes
+# them in the worker the way the view does, 'http' posts them to CRM_GRAPHQL_URL.
+# With the response cache on, 'inprocess' needs its 'django' store
+CRM_GRAPHQL_TRANSPORT = os.environ.get('CRM_GRAPHQL_TRANSPORT', 'inprocess')
+CRM_GRAPHQL_URL = os.environ.get('CRM_GRAPHQL_URL', 'http://localhost:8000/graphql')
+
+# Rows fetched per query (and per items batch) by the streaming exports
+CRM_EXPORT_CHUNK_SIZE = 2000
+
+# Products restocked per UPDATE (and transaction) by updateLowStockProducts
+CRM_RESTOCK_CHUNK_SIZE = 1000
+
+# crm/cron_jobs/send_order_reminders.py: orders per page, reminders per Celery task
+CRM_ORDER_REMINDERS = {
+    'WINDOW_DAYS': 7,
+    'PAGE_SIZE': 100,
+    'BATCH_SIZE': 100,
+}
+
+# Serve /graphql with the async view (set by asgi.py; WSGI keeps the sync view)
+CRM_ASYNC_GRAPHQL = os.environ.get('CRM_ASYNC_GRAPHQL', '0') == '1'
+
 # Celery Configuration
 CELERY_BROKER_URL = 'redis://localhost:6379/0'  # Redis as the message broker
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'  # Redis for results
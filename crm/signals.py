@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Customer, Order, Product
+from .response_cache import invalidate_models
+from .sqlite import configure_connection
+from .totals import item_amount
+
+
+def _adjust_totals(order_ids, delta, using):
+    if delta:
+        Order.objects.using(using).filter(pk__in=order_ids).update(
+            total_amount=F('total_amount') + delta
+        )
+
+
+def _snapshot_prices(sender, using, **lookups):
+    """Give rows added through ``Order.products`` their product's current price."""
+    sender.objects.using(using).filter(unit_price__isnull=True, **lookups).update(
+        unit_price=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('price')[:1])
+    )
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def maintain_order_total(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """Keep ``Order.total_amount`` in step with its items using DB-side updates.
+
+    Only the items actually added or removed are summed; the order's other
+    items are never loaded.
+    """
+    if action.startswith('post_'):
+        invalidate_models(Order)
+
+    if reverse:
+        _maintain_product_orders(sender, instance, action, pk_set, using)
+        return
+
+    delta = None
+    if action == 'post_add' and pk_set:
+        _snapshot_prices(sender, using, order_id=instance.pk, product_id__in=pk_set)
+        delta = sender.objects.using(using).filter(
+            order_id=instance.pk, product_id__in=pk_set
+        ).aggregate(total=Sum(item_amount()))['total']
+    elif action == 'pre_remove' and pk_set:
+        # Summed before the rows go, and only for products actually attached
+        delta = sender.objects.using(using).filter(
+            order_id=instance.pk, product_id__in=pk_set
+        ).aggregate(total=Sum(item_amount()))['total']
+        delta = -delta if delta else None
+    elif action == 'post_clear':
+        Order.objects.using(using).filter(pk=instance.pk).update(total_amount=Decimal('0.00'))
+        instance.total_amount = Decimal('0.00')
+        return
+
+    if delta:
+        _adjust_totals([instance.pk], delta, using)
+        instance.total_amount = Decimal(instance.total_amount or 0) + delta
+
+
+def _maintain_product_orders(sender, product, action, pk_set, using):
+    # Each order gains or loses the amount of its own item for ``product``
+    item_amounts = sender.objects.using(using).filter(
+        order_id=OuterRef('pk'), product_id=product.pk
+    ).annotate(amount=item_amount()).values('amount')[:1]
+    if action == 'post_add' and pk_set:
+        _snapshot_prices(sender, using, product_id=product.pk, order_id__in=pk_set)
+        orders = Order.objects.using(using).filter(pk__in=pk_set)
+        orders.update(total_amount=F('total_amount') + Subquery(item_amounts))
+    elif action in ('pre_remove', 'pre_clear'):
+        order_ids = sender.objects.using(using).filter(product_id=product.pk)
+        if action == 'pre_remove':
+            order_ids = order_ids.filter(order_id__in=pk_set or ())
+        orders = Order.objects.using(using).filter(pk__in=order_ids.values('order_id'))
+        orders.update(total_amount=F('total_amount') - Subquery(item_amounts))
+
+
+@receiver([post_save, post_delete], sender=Customer)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Order)
+def invalidate_cached_responses(sender, **kwargs):
+    # Writes outside the mutations (admin, shell, cron); bulk writes invalidate explicitly
+    invalidate_models(sender)
+
+
+connection_created.connect(configure_connection, dispatch_uid='crm.sqlite.configure_connection')
@@ -0,0 +1,60 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+DEFAULTS = {
+    # Apply PRAGMAS to every new SQLite connection
+    'ENABLED': False,
+    'PRAGMAS': {
+        # Readers no longer block the writer, nor the writer the readers
+        'journal_mode': 'WAL',
+        # Safe with WAL: a power loss may drop the last commits, never corrupt
+        'synchronous': 'NORMAL',
+        # Milliseconds a connection waits for a lock before "database is locked"
+        'busy_timeout': 5000,
+        # Negative: KiB of page cache per connection
+        'cache_size': -20000,
+        # Bytes of the file read through mmap instead of read()
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    },
+}
+
+_NAME = re.compile(r'^[a-z_]+$')
+_VALUE = re.compile(r'^(-?\d+|[A-Za-z]+)$')
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, 'CRM_SQLITE', {})}
+    config['PRAGMAS'] = {**DEFAULTS['PRAGMAS'], **getattr(settings, 'CRM_SQLITE', {}).get('PRAGMAS', {})}
+    return config
+
+
+def get_pragmas(settings_dict, config=None):
+    """The pragmas for a connection: CRM_SQLITE's when enabled, overridden by its DATABASES entry's ``PRAGMAS``.
+
+    A pragma set to None in either place is left at SQLite's default.
+    """
+    config = config or get_config()
+    pragmas = {**(config['PRAGMAS'] if config['ENABLED'] else {}), **settings_dict.get('PRAGMAS', {})}
+    return {name: value for name, value in pragmas.items() if value is not None}
+
+
+def apply_pragmas(cursor, pragmas):
+    """Run ``PRAGMA name = value`` for each pragma on a DB-API cursor."""
+    for name, value in pragmas.items():
+        # PRAGMA takes no parameters, so only plain names and numbers are let through
+        if not _NAME.match(name) or not _VALUE.match(str(value)):
+            raise ImproperlyConfigured(f"Invalid SQLite pragma {name} = {value!r}")
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def configure_connection(sender, connection, **kwargs):
+    """connection_created receiver: tune each new SQLite connection once, for its whole (persistent) life."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = get_pragmas(connection.settings_dict)
+    if pragmas:
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, pragmas)
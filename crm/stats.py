@@ -0,0 +1,90 @@
+from decimal import Decimal
+
+from django.db.models import Count, DateField, DecimalField, Sum, Value
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth, TruncWeek
+
+from .models import Customer, DailyCustomerSales, DailyProductSales, DailySales, Order
+
+GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+CENT = Decimal('0.01')
+
+
+def _revenue(field='total_amount'):
+    return Coalesce(
+        Sum(field),
+        Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def crm_stats(date_from=None, date_to=None, granularity=None):
+    """Customer count, order count and revenue, computed in the database.
+
+    One aggregate query per table whatever the number of orders, plus one
+    GROUP BY query when ``granularity`` ('day', 'week' or 'month') asks for periods.
+    The date range applies to ``Order.order_date`` and ``Customer.created_at``.
+    """
+    customers = Customer.objects.all()
+    orders = Order.objects.all()
+    if date_from is not None:
+        customers = customers.filter(created_at__gte=date_from)
+        orders = orders.filter(order_date__gte=date_from)
+    if date_to is not None:
+        customers = customers.filter(created_at__lte=date_to)
+        orders = orders.filter(order_date__lte=date_to)
+
+    stats = {
+        'customer_count': customers.count(),
+        **orders.aggregate(order_count=Count('pk'), revenue=_revenue()),
+        'periods': [],
+    }
+    if granularity is not None:
+        trunc = GRANULARITIES[granularity]('order_date', output_field=DateField())
+        stats['periods'] = list(
+            orders.annotate(period=trunc)
+            .values('period')
+            .annotate(order_count=Count('pk'), revenue=_revenue())
+            .order_by('period')
+        )
+    # SQLite sums decimals as floats and drops the scale
+    for row in [stats, *stats['periods']]:
+        row['revenue'] = row['revenue'].quantize(CENT)
+    return stats
+
+
+def sales_time_series(date_from=None, date_to=None, granularity='day', product_id=None, customer_id=None):
+    """Order count and revenue per period, read only from the daily rollups.
+
+    The series covers all sales, or one product's (with units sold) or one
+    customer's. ``date_from`` and ``date_to`` are inclusive days. Orders and
+    their items are never scanned, so the cost grows with the number of days
+    in range, not with the number of orders.
+    """
+    if product_id is not None:
+        rollups = DailyProductSales.objects.filter(product_id=product_id)
+    elif customer_id is not None:
+        rollups = DailyCustomerSales.objects.filter(customer_id=customer_id)
+    else:
+        rollups = DailySales.objects.all()
+    if date_from is not None:
+        rollups = rollups.filter(day__gte=date_from)
+    if date_to is not None:
+        rollups = rollups.filter(day__lte=date_to)
+
+    totals = {'order_count': Sum('order_count'), 'revenue': _revenue('revenue')}
+    if product_id is not None:
+        totals['quantity'] = Sum('quantity')
+    periods = list(
+        rollups.annotate(period=GRANULARITIES[granularity]('day', output_field=DateField()))
+        .values('period')
+        .annotate(**totals)
+        .order_by('period')
+    )
+    for row in periods:
+        row['revenue'] = row['revenue'].quantize(CENT)
+    return periods
@@ -1,9 +1,8 @@
 from celery import shared_task
-from gql import gql, Client
-from gql.transport.aiohttp import AIOHTTPTransport
 import logging
 from datetime import datetime
-import requests
+
+from .graphql_client import execute_query
 
 # Configure logging
 logging.basicConfig(
@@ -15,35 +14,26 @@ logging.basicConfig(
 
 @shared_task
 def generate_crm_report():  
-    # Set up GraphQL client
-    transport = AIOHTTPTransport(url="http://localhost:8000/graphql")
-    client = Client(transport=transport, fetch_schema_from_transport=True)
-    
-    # Define GraphQL query
-    query = gql("""
+    # Totals are aggregated by the server, so the response size is fixed
+    query = """
         query {
-            customers {
-                totalCount
-            }
-            orders {
-                totalCount
-                edges {
-                    node {
-                        totalamount
-                    }
-                }
+            crmStats {
+                customerCount
+                orderCount
+                revenue
             }
         }
-    """)
+    """
     
     try:
         # Execute the query
-        result = client.execute(query)
+        result = execute_query(query)
         
         # Extract data
-        total_customers = result["customers"]["totalCount"]
-        total_orders = result["orders"]["totalCount"]
-        total_revenue = sum(edge["node"]["totalamount"] for edge in result["orders"]["edges"])
+        stats = result["crmStats"]
+        total_customers = stats["customerCount"]
+        total_orders = stats["orderCount"]
+        total_revenue = stats["revenue"]
         
         # Log the report
         report = f"Report: {total_customers} customers, {total_orders} orders, {total_revenue} revenue"
@@ -52,4 +42,10 @@ def generate_crm_report():
     except Exception as e:
         # Log any errors
         logging.error(f"Error generating CRM report: {str(e)}")
-        raise  # Allow Celery to retry if configured
\ No newline at end of file
+        raise  # Allow Celery to retry if configured
+
+
+@shared_task
+def send_order_reminder(email, order_id):
+    # Stands in for the e-mail; queued in batches by crm.reminders
+    logging.getLogger('crm.reminders').info(f"Order ID: {order_id}, Customer Email: {email}")
@@ -1,3 +1,1171 @@
-from django.test import TestCase
+import json
+import tempfile
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import F
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from graphql_relay import from_global_id
+
+from alx_backend_graphql_crm.schema import schema
+from .models import Customer, Product, Order
+from .response_cache import get_response_cache
+
+
+def execute(query, variables=None):
+    request = RequestFactory().post('/graphql')
+    return schema.execute(query, variables=variables, context_value=request)
+
+
+class OrderBatchingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        products = Product.objects.bulk_create([
+            Product(name=f"Product {i}", price=Decimal('10.00') + i, stock=5)
+            for i in range(3)
+        ])
+        for i in range(10):
+            customer = Customer.objects.create(name=f"Customer {i}", email=f"c{i}@example.com")
+            order = Order.objects.create(customer=customer)
+            order.products.set(products[:i % 3 + 1])
+
+    def test_all_orders_batches_customer_and_products(self):
+        query = """
+            query {
+                allOrders(first: 10) {
+                    edges { node { customer { email } products { name } } }
+                }
+            }
+        """
+        # count + page (customer joined) + one prefetch for products
+        with self.assertNumQueries(3):
+            result = execute(query)
+        self.assertIsNone(result.errors, result.errors)
+        edges = result.data['allOrders']['edges']
+        self.assertEqual(len(edges), 10)
+        self.assertEqual(
+            [len(edge['node']['products']) for edge in edges],
+            [i % 3 + 1 for i in range(10)],
+        )
+        self.assertEqual(edges[0]['node']['customer']['email'], 'c0@example.com')
+
+    def test_loaders_batch_unplanned_orders(self):
+        from .loaders import Loaders
+
+        loaders = Loaders()
+        orders = list(Order.objects.all())
+        loaders.customers.prime(order.customer_id for order in orders)
+        loaders.products_by_order.prime(order.pk for order in orders)
+        with self.assertNumQueries(2):
+            for order in orders:
+                loaders.customers.load(order.customer_id)
+                loaders.products_by_order.load(order.pk)
+
+    def test_planner_only_loads_selected_columns(self):
+        query = "query { allOrders(first: 5) { edges { node { totalAmount } } } }"
+        with CaptureQueriesContext(connection) as queries:
+            result = execute(query)
+        self.assertIsNone(result.errors)
+        page_sql = queries.captured_queries[-1]['sql']
+        self.assertIn('total_amount', page_sql)
+        self.assertNotIn('order_date', page_sql)
+        self.assertNotIn('crm_customer', page_sql)
+
+    @override_settings(CRM_QUERY_DEBUG=True)
+    def test_query_debug_reports_sql_count(self):
+        get_response_cache().store.clear()
+        response = self.client.post(
+            '/graphql',
+            {'query': '{ allOrders(first: 2) { edges { node { id } } } }'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['extensions']['sqlQueries']['count'], 2)
+
+
+class BulkCreateCustomersTests(TestCase):
+    mutation = """
+        mutation($input: [CustomerInput]!) {
+            bulkCreateCustomers(input: $input) { customers { email } errors }
+        }
+    """
+
+    def test_valid_rows_created_and_errors_reported_per_index(self):
+        Customer.objects.create(name="Existing", email="taken@example.com")
+        rows = [
+            {'name': "Ann", 'email': "ann@example.com", 'phone': "+254712345678"},
+            {'name': "Bad phone", 'email': "bad@example.com", 'phone': "nope"},
+            {'name': "Taken", 'email': "taken@example.com"},
+            {'name': "Bad email", 'email': "not-an-email"},
+            {'name': "Ann again", 'email': "ann@example.com"},
+            {'name': "Ben", 'email': "ben@example.com"},
+        ]
+        result = execute(self.mutation, {'input': rows})
+        self.assertIsNone(result.errors)
+        payload = result.data['bulkCreateCustomers']
+        self.assertEqual(
+            [customer['email'] for customer in payload['customers']],
+            ["ann@example.com", "ben@example.com"],
+        )
+        self.assertEqual([error.split(':')[0] for error in payload['errors']],
+                         ["Customer 2", "Customer 3", "Customer 4", "Customer 5"])
+        self.assertEqual(payload['errors'][0], "Customer 2: Invalid phone format")
+        self.assertEqual(payload['errors'][1], "Customer 3: Email taken@example.com already exists")
+        self.assertEqual(Customer.objects.count(), 3)
+
+    def test_uniqueness_probe_and_insert_are_set_based(self):
+        rows = [{'name': f"Customer {i}", 'email': f"c{i}@example.com"} for i in range(200)]
+        # email__in probe + savepoint/insert/release
+        with self.assertNumQueries(4):
+            result = execute(self.mutation, {'input': rows})
+        self.assertEqual(result.data['bulkCreateCustomers']['errors'], [])
+        self.assertEqual(Customer.objects.count(), 200)
+
+
+class CreateOrderTests(TestCase):
+    mutation = """
+        mutation($input: OrderInput!) {
+            createOrder(input: $input) {
+                order { totalAmount customer { email } products { name } }
+            }
+        }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name="Ann", email="ann@example.com")
+        cls.products = Product.objects.bulk_create([
+            Product(name="Laptop", price=Decimal('999.99'), stock=10),
+            Product(name="Phone", price=Decimal('499.99'), stock=20),
+        ])
+
+    def test_query_count_is_pinned(self):
+        variables = {'input': {
+            'customerId': self.customer.pk,
+            'productIds': [product.pk for product in self.products],
+        }}
+        # customer + in_bulk products + savepoint/stock update (in its own savepoint)/order insert/items insert/
+        # day, customer and product rollup upserts/release
+        with self.assertNumQueries(12):
+            result = execute(self.mutation, variables)
+        self.assertIsNone(result.errors)
+        order = result.data['createOrder']['order']
+        self.assertEqual(order['totalAmount'], '1499.98')
+        self.assertEqual([p['name'] for p in order['products']], ["Laptop", "Phone"])
+        self.assertEqual(Order.objects.get().products.count(), 2)
+
+    def test_all_missing_products_reported_at_once(self):
+        variables = {'input': {
+            'customerId': self.customer.pk,
+            'productIds': [self.products[0].pk, 998, 999],
+        }}
+        result = execute(self.mutation, variables)
+        self.assertEqual(result.errors[0].message, "Products with IDs 998, 999 do not exist")
+        self.assertFalse(Order.objects.exists())
+
+    def test_items_decrement_stock_and_snapshot_prices(self):
+        laptop, phone = self.products
+        variables = {'input': {
+            'customerId': self.customer.pk,
+            'items': [{'productId': laptop.pk, 'quantity': 3}, {'productId': phone.pk}],
+        }}
+        result = execute(self.mutation.replace('products { name }', 'items { quantity unitPrice product { name } }'),
+                         variables)
+        self.assertIsNone(result.errors)
+        order = result.data['createOrder']['order']
+        self.assertEqual(order['totalAmount'], '3499.96')
+        self.assertEqual([(item['product']['name'], item['quantity'], item['unitPrice']) for item in order['items']],
+                         [("Laptop", 3, '999.99'), ("Phone", 1, '499.99')])
+        self.assertEqual(list(Product.objects.order_by('pk').values_list('stock', flat=True)), [7, 19])
+
+        # Later price changes leave the order alone
+        Product.objects.filter(pk=laptop.pk).update(price=Decimal('1.00'))
+        from .totals import mismatched_totals
+        self.assertFalse(mismatched_totals(Order.objects.all()).exists())
+
+    def test_insufficient_stock_changes_nothing(self):
+        laptop, phone = self.products
+        variables = {'input': {
+            'customerId': self.customer.pk,
+            'items': [{'productId': laptop.pk, 'quantity': 11}, {'productId': phone.pk, 'quantity': 2}],
+        }}
+        result = execute(self.mutation, variables)
+        self.assertEqual(result.errors[0].message, "Insufficient stock for Laptop (requested 11, available 10)")
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(list(Product.objects.order_by('pk').values_list('stock', flat=True)), [10, 20])
+
+    @skipUnless(connection.vendor == 'sqlite', "SQLite parameter limit")
+    def test_reservations_past_the_parameter_limit_are_all_or_none(self):
+        import sqlite3
+        from .inventory import InsufficientStock, reserve_stock
+
+        products = Product.objects.bulk_create([Product(name=f"P{i}", price=Decimal('1.00'), stock=1) for i in range(300)])
+        quantities = {product.pk: 1 for product in products}
+        connection.ensure_connection()
+        # The oldest SQLite Django supports allows 999 parameters per statement
+        limit = connection.connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+        try:
+            # The shortage is in the last batch; the earlier batches are undone
+            with self.assertRaises(InsufficientStock) as raised:
+                reserve_stock({**quantities, products[-1].pk: 2})
+            self.assertEqual(raised.exception.shortages, {products[-1].pk: (2, 1)})
+            self.assertFalse(Product.objects.filter(stock=0).exists())
+            reserve_stock(quantities)
+        finally:
+            connection.connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, limit)
+        self.assertEqual(Product.objects.filter(stock=0).count(), 300)
+
+
+class BulkCreateOrdersTests(TestCase):
+    mutation = """
+        mutation($input: [OrderInput!]!) {
+            bulkCreateOrders(input: $input) {
+                orders { totalAmount customer { email } items { product { name } quantity } }
+                errors
+            }
+        }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name="Ann", email="ann@example.com")
+        cls.pen, cls.ink = Product.objects.bulk_create([
+            Product(name="Pen", price=Decimal('2.50'), stock=5),
+            Product(name="Ink", price=Decimal('7.10'), stock=100),
+        ])
+
+    def test_valid_orders_created_and_errors_reported_per_index(self):
+        rows = [
+            {'customerId': self.customer.pk, 'items': [{'productId': self.pen.pk, 'quantity': 3}]},
+            {'customerId': 999, 'productIds': [self.pen.pk]},
+            {'customerId': self.customer.pk, 'productIds': [self.pen.pk, 998]},
+            {'customerId': self.customer.pk, 'productIds': []},
+            # Only 2 pens are left after the first order
+            {'customerId': self.customer.pk, 'items': [{'productId': self.pen.pk, 'quantity': 3}]},
+            {'customerId': self.customer.pk, 'items': [{'productId': self.pen.pk, 'quantity': 2},
+                                                       {'productId': self.ink.pk}]},
+        ]
+        with self.assertNumQueries(12):
+            result = execute(self.mutation, {'input': rows})
+        self.assertIsNone(result.errors, result.errors)
+        payload = result.data['bulkCreateOrders']
+        self.assertEqual(payload['errors'], [
+            "Order 2: Customer with ID 999 does not exist",
+            "Order 3: Product with ID 998 does not exist",
+            "Order 4: At least one product must be selected",
+            "Order 5: Insufficient stock for Pen (requested 3, available 2)",
+        ])
+        self.assertEqual([order['totalAmount'] for order in payload['orders']], ['7.50', '12.10'])
+        self.assertEqual(payload['orders'][1]['items'], [
+            {'product': {'name': "Pen"}, 'quantity': 2}, {'product': {'name': "Ink"}, 'quantity': 1},
+        ])
+        self.assertEqual(Product.objects.get(pk=self.pen.pk).stock, 0)
+
+        from .models import DailySales
+        from .totals import mismatched_totals
+        self.assertFalse(mismatched_totals(Order.objects.all()).exists())
+        self.assertEqual(list(DailySales.objects.values_list('order_count', 'revenue')), [(2, Decimal('19.60'))])
+
+    def test_query_count_does_not_grow_with_the_feed(self):
+        rows = [{'customerId': self.customer.pk, 'productIds': [self.ink.pk]} for _ in range(50)]
+        # customers + products + savepoint/stock update (own savepoint)/orders/items/3 rollup upserts/release
+        with self.assertNumQueries(12):
+            result = execute(self.mutation, {'input': rows})
+        self.assertEqual(result.data['bulkCreateOrders']['errors'], [])
+        self.assertEqual(Order.objects.count(), 50)
+        self.assertEqual(Product.objects.get(pk=self.ink.pk).stock, 50)
+
+    def test_orders_share_one_date_without_returning(self):
+        from datetime import datetime
+        from unittest import mock
+
+        rows = [{'customerId': self.customer.pk, 'productIds': [self.ink.pk]}] * 3
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            result = execute(self.mutation.replace('totalAmount', 'orderDate'), {'input': rows})
+        self.assertIsNone(result.errors, result.errors)
+        dates = {datetime.fromisoformat(order['orderDate']) for order in result.data['bulkCreateOrders']['orders']}
+        self.assertEqual(len(dates), 1)
+        self.assertEqual(set(Order.objects.values_list('order_date', flat=True)), dates)
+
+
+class UpdateLowStockProductsTests(TestCase):
+    mutation = """
+        mutation($threshold: Int, $increment: Int) {
+            updateLowStockProducts(threshold: $threshold, increment: $increment) {
+                updatedProducts { name stock } updatedCount message
+            }
+        }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create([
+            Product(name=f"Product {stock}", price=Decimal('1.00'), stock=stock) for stock in (0, 15, 4, 9, 20, 1)
+        ])
+
+    def restock(self):
+        with override_settings(CRM_RESTOCK_CHUNK_SIZE=2):
+            result = execute(self.mutation, {'threshold': 5, 'increment': 3})
+        self.assertIsNone(result.errors)
+        return result.data['updateLowStockProducts']
+
+    def test_reports_exactly_the_restocked_products(self):
+        data = self.restock()
+        # Product 1 ends at 4, still under the threshold, but is topped up only once
+        self.assertEqual(data['updatedProducts'], [
+            {'name': "Product 0", 'stock': 3}, {'name': "Product 4", 'stock': 7}, {'name': "Product 1", 'stock': 4},
+        ])
+        self.assertEqual(data['updatedCount'], 3)
+        self.assertEqual(data['message'], "Updated 3 low-stock products")
+        self.assertEqual(
+            list(Product.objects.order_by('pk').values_list('stock', flat=True)), [3, 15, 7, 9, 20, 4],
+        )
+
+    def test_locked_snapshot_without_update_returning(self):
+        from unittest import mock
+
+        with mock.patch('crm.inventory._can_update_returning', return_value=False):
+            data = self.restock()
+        self.assertEqual([product['stock'] for product in data['updatedProducts']], [3, 7, 4])
+        self.assertEqual(data['updatedCount'], 3)
+
+
+class OrderTotalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name="Ann", email="ann@example.com")
+        cls.laptop, cls.phone = Product.objects.bulk_create([
+            Product(name="Laptop", price=Decimal('999.99'), stock=10),
+            Product(name="Phone", price=Decimal('499.99'), stock=20),
+        ])
+
+    def assertStoredTotal(self, order, expected):
+        order.refresh_from_db(fields=['total_amount'])
+        self.assertEqual(order.total_amount, Decimal(expected))
+
+    def test_total_follows_add_remove_and_clear(self):
+        order = Order.objects.create(customer=self.customer)
+        order.products.add(self.laptop, self.phone)
+        self.assertEqual(order.total_amount, Decimal('1499.98'))
+        self.assertStoredTotal(order, '1499.98')
+
+        order.products.remove(self.phone)
+        self.assertStoredTotal(order, '999.99')
+
+        self.phone.orders.add(order)
+        self.assertStoredTotal(order, '1499.98')
+
+        order.products.clear()
+        self.assertStoredTotal(order, '0.00')
+
+    def test_total_uses_quantity_and_price_at_time_of_adding(self):
+        order = Order.objects.create(customer=self.customer)
+        order.products.add(self.phone, through_defaults={'quantity': 2})
+        self.laptop.orders.add(order)
+        Product.objects.filter(pk=self.laptop.pk).update(price=Decimal('5.00'))
+        self.assertStoredTotal(order, '1999.97')
+        self.assertEqual(order.items.get(product=self.laptop).unit_price, Decimal('999.99'))
+
+        self.phone.orders.remove(order)
+        self.assertStoredTotal(order, '999.99')
+        self.laptop.orders.clear()
+        self.assertStoredTotal(order, '0.00')
+
+    def test_plain_save_does_not_scan_products(self):
+        order = Order.objects.create(customer=self.customer)
+        order.products.add(self.laptop)
+        with self.assertNumQueries(1):
+            order.save()
+
+    def test_recompute_command_verifies_and_fixes_totals(self):
+        from io import StringIO
+        from django.core.management import CommandError, call_command
+
+        order = Order.objects.create(customer=self.customer)
+        order.products.add(self.laptop)
+        Order.objects.filter(pk=order.pk).update(total_amount=Decimal('1.00'))
+
+        with self.assertRaises(CommandError):
+            call_command('recompute_order_totals', verify=True, stdout=StringIO())
+        call_command('recompute_order_totals', chunk_size=1, stdout=StringIO())
+        self.assertStoredTotal(order, '999.99')
+        call_command('recompute_order_totals', verify=True, stdout=StringIO())
+
+
+class KeysetPaginationTests(TestCase):
+    query = """
+        query($after: String, $before: String, $first: Int, $last: Int, $orderBy: String, $minTotal: Decimal) {
+            allOrders(keyset: true, orderBy: $orderBy, first: $first, last: $last,
+                      after: $after, before: $before, totalAmountGte: $minTotal) {
+                edges { cursor node { id totalAmount } }
+                pageInfo { hasNextPage hasPreviousPage endCursor startCursor }
+            }
+        }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(name="Ann", email="ann@example.com")
+        # Repeated totals make the id tie-breaker matter
+        Order.objects.bulk_create([
+            Order(customer=customer, total_amount=Decimal(i % 4)) for i in range(10)
+        ])
+
+    def page(self, **variables):
+        result = execute(self.query, variables)
+        self.assertIsNone(result.errors, result.errors)
+        return result.data['allOrders']
+
+    def test_pages_follow_order_by_without_offset_or_count(self):
+        seen, after = [], None
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                page = self.page(orderBy='-totalAmount', first=3, after=after)
+            self.assertEqual(len(queries), 1)
+            self.assertNotIn('OFFSET', queries[0]['sql'])
+            seen += [int(from_global_id(edge['node']['id'])[1]) for edge in page['edges']]
+            if not page['pageInfo']['hasNextPage']:
+                break
+            after = page['pageInfo']['endCursor']
+        self.assertEqual(seen, list(Order.objects.order_by('-total_amount', '-pk').values_list('pk', flat=True)))
+
+    def test_filters_and_backward_paging(self):
+        first_page = self.page(orderBy='totalAmount', first=4, minTotal='2')
+        totals = [edge['node']['totalAmount'] for edge in first_page['edges']]
+        self.assertEqual(totals, ['2.00', '2.00', '3.00', '3.00'])
+
+        previous = self.page(orderBy='totalAmount', last=2, before=first_page['pageInfo']['endCursor'], minTotal='2')
+        self.assertEqual(
+            [edge['cursor'] for edge in previous['edges']],
+            [edge['cursor'] for edge in first_page['edges'][1:3]],
+        )
+        self.assertTrue(previous['pageInfo']['hasPreviousPage'])
+
+    def test_cursor_must_match_ordering(self):
+        page = self.page(orderBy='totalAmount', first=1)
+        result = execute(self.query, {'orderBy': '-orderDate', 'first': 1, 'after': page['pageInfo']['endCursor']})
+        self.assertEqual(result.errors[0].message, "Cursor does not match the requested ordering")
+
+
+class DocumentCacheTests(TestCase):
+    query = '{ allProducts(first: 1) { edges { node { name } } } }'
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .documents import get_document_cache
+
+        cache.clear()
+        get_response_cache().store.clear()
+        self.documents = get_document_cache()
+        self.documents.clear()
+
+    def post(self, body):
+        return self.client.post('/graphql', body, content_type='application/json')
+
+    def test_documents_are_parsed_and_validated_once(self):
+        self.post({'query': self.query})
+        misses = self.documents.misses
+        response = self.post({'query': self.query})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.documents.misses, misses)
+        self.assertEqual(len(self.documents), 1)
+
+    def test_persisted_query_round_trip(self):
+        from .documents import query_hash
+
+        extensions = {'persistedQuery': {'version': 1, 'sha256Hash': query_hash(self.query)}}
+        response = self.post({'extensions': extensions})
+        self.assertEqual(response.json()['errors'][0]['message'], "PersistedQueryNotFound")
+
+        response = self.post({'query': self.query, 'extensions': extensions})
+        self.assertIn('data', response.json())
+
+        response = self.client.get('/graphql', {'extensions': json.dumps(extensions)},
+                                   HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['data'], {'allProducts': {'edges': []}})
+
+    def test_persisted_query_hash_must_match(self):
+        extensions = {'persistedQuery': {'version': 1, 'sha256Hash': '0' * 64}}
+        response = self.post({'query': self.query, 'extensions': extensions})
+        self.assertEqual(response.status_code, 400)
+
+    def test_view_copies_match_the_installed_graphene_django(self):
+        import graphene_django
+        from .views import GRAPHENE_DJANGO_VERSION
+
+        # On an upgrade, compare the copied view methods with the new GraphQLView first
+        self.assertEqual(graphene_django.__version__, GRAPHENE_DJANGO_VERSION)
+
+
+@override_settings(CRM_RESPONSE_CACHE={'ENABLED': True})
+class ResponseCacheTests(TestCase):
+    query = '{ allProducts(lowStock: true) { edges { node { name stock } } } }'
+
+    def setUp(self):
+        self.cache = get_response_cache()
+        self.cache.store.clear()
+        Product.objects.create(name="Cable", price=Decimal('5.00'), stock=2)
+
+    def post(self, query):
+        return self.client.post('/graphql', {'query': query}, content_type='application/json').json()
+
+    def test_repeated_reads_are_served_from_cache(self):
+        hits = self.cache.hits
+        first = self.post(self.query)
+        with self.assertNumQueries(0):
+            second = self.post(self.query)
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.hits, hits + 1)
+
+    def test_mutation_invalidates_dependent_reads(self):
+        self.post(self.query)
+        orders = self.post('{ allOrders(first: 1) { edges { node { id } } } }')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post('mutation { updateLowStockProducts { message } }')
+        # Restocked to 12, so no longer low on stock
+        self.assertEqual(self.post(self.query)['data']['allProducts']['edges'], [])
+
+        # Orders read products too, while customers do not
+        misses = self.cache.misses
+        self.post('{ allOrders(first: 1) { edges { node { id } } } }')
+        self.assertEqual(self.cache.misses, misses + 1)
+        self.assertIn('data', orders)
+
+    def test_off_unless_enabled(self):
+        hits, misses = self.cache.hits, self.cache.misses
+        with override_settings(CRM_RESPONSE_CACHE={}):
+            self.post(self.query)
+            self.post(self.query)
+        self.assertEqual((self.cache.hits, self.cache.misses), (hits, misses))
+
+    def test_mutations_are_never_cached(self):
+        stats = self.cache.stats()
+        Product.objects.update(stock=0)
+        self.post('mutation { updateLowStockProducts { message } }')
+        Product.objects.update(stock=0)
+        self.post('mutation { updateLowStockProducts { message } }')
+        self.assertEqual(Product.objects.get().stock, 10)
+        self.assertEqual(self.cache.stats()['hits'], stats['hits'])
+        self.assertEqual(self.cache.stats()['misses'], stats['misses'])
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        from unittest import mock
+
+        patcher = mock.patch('crm.routing.get_replica_alias', return_value='replica')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_query_reads_go_to_the_replica_until_the_request_writes(self):
+        from unittest import mock
+        from django.db import connections
+        from .routing import ReplicaRouter, RoutingState, _state
+
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Order))
+        state = RoutingState()
+        self.addCleanup(_state.reset, _state.set(state))
+        self.assertEqual(router.db_for_read(Order), 'default')
+
+        state.use_replica()
+        # TestCase runs in a transaction, which pins reads to the primary
+        self.assertEqual(router.db_for_read(Order), 'default')
+        with mock.patch.object(connections['default'], 'in_atomic_block', False):
+            self.assertEqual(router.db_for_read(Order), 'replica')
+            self.assertEqual(router.db_for_write(Order), 'default')
+            self.assertEqual(router.db_for_read(Order), 'default')
+
+    @override_settings(CRM_RESPONSE_CACHE={'ENABLED': True})
+    def test_clients_that_wrote_stick_to_the_primary(self):
+        def post(query):
+            return self.client.post('/graphql', {'query': query}, content_type='application/json')
+
+        response = post('{ allCustomers(first: 1) { edges { node { id } } } }')
+        self.assertNotIn('crm_read_primary', response.cookies)
+
+        response = post('mutation { createCustomer(input: {name: "Ann", email: "ann@example.com"}) { message } }')
+        self.assertEqual(response.json()['data']['createCustomer']['message'], "Customer created successfully")
+        self.assertEqual(response.cookies['crm_read_primary']['max-age'], 10)
+
+        # Served from the primary, not from the response cache filled before the write
+        self.client.cookies['crm_read_primary'] = '1'
+        response = post('{ allCustomers(first: 1) { edges { node { id } } } }')
+        self.assertEqual(len(response.json()['data']['allCustomers']['edges']), 1)
+        self.assertNotIn('crm_read_primary', response.cookies)
+
+    @override_settings(DEBUG=True)
+    def test_middleware_runs_async_under_asgi(self):
+        from asgiref.sync import async_to_sync
+
+        # The ASGI handler logs every sync-only middleware it has to wrap in a thread
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            response = async_to_sync(self.async_client.post)(
+                '/graphql',
+                {'query': 'mutation { createCustomer(input: {name: "Ann", email: "ann@example.com"}) { message } }'},
+                content_type='application/json',
+            )
+        self.assertEqual(response.json()['data']['createCustomer']['message'], "Customer created successfully")
+        self.assertEqual(response.cookies['crm_read_primary']['max-age'], 10)
+
+
+class SQLitePragmaTests(TestCase):
+    def test_production_pragmas_with_per_connection_overrides(self):
+        import sqlite3
+        from django.core.exceptions import ImproperlyConfigured
+        from .sqlite import apply_pragmas, get_pragmas
+
+        with override_settings(CRM_SQLITE={'ENABLED': False}):
+            self.assertEqual(get_pragmas({}), {})
+        with override_settings(CRM_SQLITE={'ENABLED': True, 'PRAGMAS': {'mmap_size': None}}):
+            pragmas = get_pragmas({'PRAGMAS': {'busy_timeout': 100}})
+        self.assertEqual(pragmas['busy_timeout'], 100)
+        self.assertEqual(pragmas['synchronous'], 'NORMAL')
+        self.assertNotIn('mmap_size', pragmas)
+
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(f'{directory}/db.sqlite3')
+            self.addCleanup(db.close)
+            apply_pragmas(db.cursor(), pragmas)
+            self.assertEqual(db.execute('PRAGMA journal_mode').fetchone(), ('wal',))
+            self.assertEqual(db.execute('PRAGMA busy_timeout').fetchone(), (100,))
+            with self.assertRaises(ImproperlyConfigured):
+                apply_pragmas(db.cursor(), {'user_version': '1; DROP TABLE crm_order'})
+
+    def test_benchmark_reports_each_mode(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('benchmark_sqlite', '--writers', '2', '--readers', '1', '--seconds', '0.2', '--rows', '100', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split('  ')[0] for line in lines[-3:]], ['default', 'production, reconnect', 'production, persistent'])
+
+
+class QueryCostTests(TestCase):
+    def post(self, query):
+        get_response_cache().store.clear()
+        return self.client.post('/graphql', {'query': query}, content_type='application/json')
+
+    def test_cost_is_reported_in_extensions(self):
+        response = self.post("""
+            { allOrders(first: 20) { edges { node { customer { email } products { name } } } } }
+        """)
+        self.assertEqual(response.status_code, 200)
+        # connection + 20 edges + 20 nodes + 20 customers + 20 * 10 products
+        self.assertEqual(response.json()['extensions']['cost']['requested'], 261)
+        self.assertEqual(response.json()['extensions']['cost']['depth'], 5)
+
+    def test_over_budget_operation_is_rejected_before_execution(self):
+        query = """
+            query($n: Int) { allOrders(first: $n) { edges { node { products { name } } } } }
+        """
+        with self.assertNumQueries(0):
+            response = self.client.post(
+                '/graphql', {'query': query, 'variables': {'n': 10000}}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertIn("exceeds the maximum", body['errors'][0]['message'])
+        self.assertEqual(body['extensions']['cost']['requested'], 120001)
+
+    @override_settings(CRM_QUERY_COST={'MAX_DEPTH': 3})
+    def test_depth_limit(self):
+        response = self.post('{ allOrders(first: 1) { edges { node { customer { email } } } } }')
+        self.assertIn("Query depth 5 exceeds", response.json()['errors'][0]['message'])
+
+
+class TracingTests(TestCase):
+    query = '{ allOrders(first: 5) { edges { node { customer { email } products { name } } } } }'
+
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(name="Pen", price=Decimal('2.00'), stock=5)
+        customer = Customer.objects.create(name="Ann", email="ann@example.com")
+        Order.objects.create(customer=customer).products.add(product)
+
+    def setUp(self):
+        get_response_cache().store.clear()
+
+    def post(self, **headers):
+        return self.client.post('/graphql', {'query': self.query}, content_type='application/json', **headers)
+
+    def test_trace_is_returned_when_requested(self):
+        body = self.post(HTTP_X_CRM_TRACE='1').json()
+        tracing = body['extensions']['tracing']
+        resolvers = {tuple(resolver['path']): resolver for resolver in tracing['execution']['resolvers']}
+        # The connection runs the count, page and products prefetch itself
+        self.assertEqual(resolvers[('allOrders',)]['sqlCount'], 3)
+        self.assertEqual(resolvers[('allOrders', 'edges', 0, 'node', 'customer')]['sqlCount'], 0)
+        self.assertEqual(tracing['sql']['count'], 3)
+
+    def test_no_trace_without_header(self):
+        self.assertNotIn('tracing', self.post().json().get('extensions', {}))
+
+    @override_settings(CRM_TRACING={'SAMPLE_RATE': 1, 'SLOW_OPERATION_MS': 0})
+    def test_sampled_slow_operation_is_logged(self):
+        with self.assertLogs('crm.tracing', 'WARNING') as logs:
+            body = self.post().json()
+        self.assertNotIn('tracing', body.get('extensions', {}))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['event'], 'slow_graphql_operation')
+        self.assertEqual(entry['sqlCount'], 3)
+        self.assertEqual(entry['resolvers'][0]['path'], 'allOrders')
+
+
+class CRMStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from datetime import datetime, timezone
+
+        product = Product.objects.create(name="Pen", price=Decimal('2.50'), stock=5)
+        customer = Customer.objects.create(name="Ann", email="ann@example.com")
+        for day in (1, 1, 2, 9):
+            order = Order.objects.create(customer=customer)
+            order.products.add(product)
+            Order.objects.filter(pk=order.pk).update(order_date=datetime(2024, 1, day, 12, tzinfo=timezone.utc))
+
+    def test_totals_are_aggregated_in_the_database(self):
+        with self.assertNumQueries(2):
+            result = execute('{ crmStats { customerCount orderCount revenue periods { period } } }')
+        self.assertIsNone(result.errors, result.errors)
+        self.assertEqual(
+            result.data['crmStats'],
+            {'customerCount': 1, 'orderCount': 4, 'revenue': '10.00', 'periods': []},
+        )
+
+    def test_grouped_by_day_within_range(self):
+        result = execute("""
+            query($from: DateTime) {
+                crmStats(dateFrom: $from, granularity: DAY) {
+                    orderCount
+                    periods { period orderCount revenue }
+                }
+            }
+        """, {'from': '2024-01-02T00:00:00+00:00'})
+        self.assertIsNone(result.errors, result.errors)
+        self.assertEqual(result.data['crmStats']['orderCount'], 2)
+        self.assertEqual(result.data['crmStats']['periods'], [
+            {'period': '2024-01-02', 'orderCount': 1, 'revenue': '2.50'},
+            {'period': '2024-01-09', 'orderCount': 1, 'revenue': '2.50'},
+        ])
+
+    def test_grouped_by_week(self):
+        result = execute('{ crmStats(granularity: WEEK) { periods { period orderCount } } }')
+        self.assertEqual(result.data['crmStats']['periods'], [
+            {'period': '2024-01-01', 'orderCount': 3},
+            {'period': '2024-01-08', 'orderCount': 1},
+        ])
+
+
+class SalesRollupTests(TestCase):
+    mutation = """
+        mutation($input: OrderInput!) { createOrder(input: $input) { order { id } } }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customers = [Customer.objects.create(name=name, email=f"{name}@example.com") for name in ("ann", "bob")]
+        cls.products = Product.objects.bulk_create([
+            Product(name="Pen", price=Decimal('2.50'), stock=100),
+            Product(name="Ink", price=Decimal('7.10'), stock=100),
+        ])
+
+    def order(self, customer, *items):
+        result = execute(self.mutation, {'input': {
+            'customerId': customer.pk,
+            'items': [{'productId': product.pk, 'quantity': quantity} for product, quantity in items],
+        }})
+        self.assertIsNone(result.errors, result.errors)
+
+    def rollups(self):
+        from .models import DailyCustomerSales, DailyProductSales, DailySales
+
+        return (
+            list(DailySales.objects.values_list('day', 'order_count', 'revenue')),
+            sorted(DailyCustomerSales.objects.values_list('day', 'customer_id', 'order_count', 'revenue')),
+            sorted(DailyProductSales.objects.values_list('day', 'product_id', 'order_count', 'quantity', 'revenue')),
+        )
+
+    def test_incremental_rollups_match_a_rebuild(self):
+        from .rollups import rebuild_rollups
+
+        pen, ink = self.products
+        self.order(self.customers[0], (pen, 2), (ink, 1))
+        self.order(self.customers[0], (pen, 1))
+        self.order(self.customers[1], (ink, 3))
+        days, customers, products = self.rollups()
+        self.assertEqual([row[1:] for row in days], [(3, Decimal('35.90'))])
+        self.assertEqual([row[2:] for row in customers], [(2, Decimal('14.60')), (1, Decimal('21.30'))])
+        self.assertEqual([row[2:] for row in products], [(2, 3, Decimal('7.50')), (2, 4, Decimal('28.40'))])
+
+        self.assertEqual(rebuild_rollups(), (1, 2, 2))
+        self.assertEqual(self.rollups(), (days, customers, products))
+
+    @skipUnless(connection.vendor == 'sqlite', "SQLite parameter limit")
+    def test_upserts_stay_within_the_parameter_limit(self):
+        import sqlite3
+
+        products = Product.objects.bulk_create([
+            Product(name=f"Product {i}", price=Decimal('1.00'), stock=1) for i in range(250)
+        ])
+        connection.ensure_connection()
+        # The oldest SQLite Django supports allows 999 parameters per statement
+        limit = connection.connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+        try:
+            result = execute("""
+                mutation($input: [OrderInput!]!) { bulkCreateOrders(input: $input) { errors } }
+            """, {'input': [{'customerId': self.customers[0].pk, 'productIds': [product.pk]} for product in products]})
+        finally:
+            connection.connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, limit)
+        self.assertIsNone(result.errors, result.errors)
+        self.assertEqual(result.data['bulkCreateOrders']['errors'], [])
+        days, customers, products = self.rollups()
+        self.assertEqual([row[1:] for row in days], [(250, Decimal('250.00'))])
+        self.assertEqual(len(products), 250)
+
+    def test_series_reads_only_the_rollups(self):
+        pen, ink = self.products
+        self.order(self.customers[0], (pen, 2), (ink, 1))
+        self.order(self.customers[1], (pen, 4))
+        query = """
+            query($productId: ID, $customerId: ID) {
+                salesTimeSeries(granularity: MONTH, productId: $productId, customerId: $customerId) {
+                    orderCount revenue quantity
+                }
+            }
+        """
+        with CaptureQueriesContext(connection) as queries:
+            result = execute(query)
+        self.assertIsNone(result.errors, result.errors)
+        self.assertEqual(result.data['salesTimeSeries'], [{'orderCount': 2, 'revenue': '22.10', 'quantity': None}])
+        self.assertEqual(len(queries), 1)
+        self.assertIn('crm_dailysales', queries[0]['sql'])
+
+        result = execute(query, {'productId': pen.pk})
+        self.assertEqual(result.data['salesTimeSeries'], [{'orderCount': 2, 'revenue': '15.00', 'quantity': 6}])
+        result = execute(query, {'customerId': self.customers[1].pk})
+        self.assertEqual(result.data['salesTimeSeries'], [{'orderCount': 1, 'revenue': '10.00', 'quantity': None}])
+        result = execute(query, {'productId': pen.pk, 'customerId': self.customers[1].pk})
+        self.assertEqual(result.errors[0].message, "Filter by a product or a customer, not both")
+
+
+class GraphQLClientTests(TestCase):
+    def test_inprocess_execution_returns_client_shaped_data(self):
+        from .graphql_client import execute_query
+
+        Customer.objects.create(name="Ann", email="ann@example.com")
+        data = execute_query(
+            'query($email: String) { allCustomers(email: $email) { edges { node { email } } } crmStats { revenue } }',
+            {'email': 'ann'},
+        )
+        self.assertEqual(data['allCustomers']['edges'], [{'node': {'email': 'ann@example.com'}}])
+        self.assertEqual(data['crmStats'], {'revenue': '0.00'})
+
+    def test_errors_are_raised(self):
+        from .graphql_client import GraphQLClientError, execute_query
+
+        with self.assertRaisesMessage(GraphQLClientError, "Cannot query field 'nope'"):
+            execute_query('{ nope }')
+
+    @override_settings(CRM_RESPONSE_CACHE={'ENABLED': True, 'STORE': 'django'})
+    def test_job_mutations_invalidate_the_web_cache(self):
+        from .graphql_client import execute_query
+
+        Product.objects.create(name="Pen", price=Decimal('2.00'), stock=3)
+        query = '{ allProducts(lowStock: true) { edges { node { name } } } }'
+
+        def read():
+            return self.client.post('/graphql', {'query': query}, content_type='application/json').json()
+
+        self.assertEqual(len(read()['data']['allProducts']['edges']), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            execute_query('mutation { updateLowStockProducts { message } }')
+        self.assertEqual(read()['data']['allProducts']['edges'], [])
+
+    @override_settings(CRM_RESPONSE_CACHE={'ENABLED': True, 'STORE': 'local'})
+    def test_local_response_cache_is_refused(self):
+        from django.core.exceptions import ImproperlyConfigured
+
+        from .graphql_client import execute_query
+
+        with self.assertRaisesMessage(ImproperlyConfigured, "STORE'] = 'django'"):
+            execute_query('{ hello }')
+
+    def test_cost_budget_applies(self):
+        from .graphql_client import GraphQLClientError, execute_query
+
+        with override_settings(CRM_QUERY_COST={'MAX_DEPTH': 1}), self.assertRaisesMessage(GraphQLClientError, 'Query depth'):
+            execute_query('{ allCustomers { edges { node { name } } } }')
+
+    def test_cron_job_runs_without_a_web_server(self):
+        from . import cron
+
+        product = Product.objects.create(name="Pen", price=Decimal('2.00'), stock=3)
+        cron.update_low_stock()
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 13)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        products = Product.objects.bulk_create([
+            Product(name=f"Product {i}", price=Decimal('1.00'), stock=5) for i in range(3)
+        ])
+        for i in range(5):
+            customer = Customer.objects.create(name=f"Customer {i}", email=f"c{i}@example.com")
+            Order.objects.create(customer=customer).products.set(products[:i % 3 + 1])
+
+    def test_orders_csv_batches_products_per_chunk(self):
+        import csv
+        import io
+
+        with override_settings(CRM_EXPORT_CHUNK_SIZE=2), self.assertNumQueries(4):
+            # The orders query plus one items batch per chunk of two orders
+            response = self.client.get('/export/orders.csv', {'product_name': 'Product'})
+            content = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1]['customer_email'], 'c1@example.com')
+        self.assertEqual(rows[1]['product_names'], 'Product 0;Product 1')
+        self.assertEqual(rows[1]['quantities'], '1;1')
+        self.assertEqual(rows[1]['total_amount'], '2.00')
+
+    def test_customers_ndjson_uses_filterset(self):
+        response = self.client.get('/export/customers.ndjson', {'email': 'c3@'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['name'] for line in lines], ['Customer 3'])
+
+    def test_invalid_filter_and_unknown_export(self):
+        self.assertEqual(self.client.get('/export/orders.csv', {'order_date_gte': 'soon'}).status_code, 400)
+        self.assertEqual(self.client.get('/export/products.csv').status_code, 404)
+
+
+class IndexBenchmarkTests(TestCase):
+    def test_benchmark_restores_indexes(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        product = Product.objects.create(name="Pen", price=Decimal('2.00'), stock=5)
+        customer = Customer.objects.create(name="Ann", email="ann@example.com")
+        Order.objects.create(customer=customer).products.add(product)
+
+        out = StringIO()
+        call_command('benchmark_indexes', repeat=1, stdout=out)
+        self.assertIn('SCAN crm_order', out.getvalue())
+        self.assertIn('Median latency', out.getvalue())
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(cursor, Order._meta.db_table)
+        self.assertIn('crm_order_customer_date_idx', indexes)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ann = Customer.objects.create(name="Ann Smith", email="ann@example.com")
+        cls.bob = Customer.objects.create(name="Bob Annan", email="bob@shop.org")
+        cls.pen = Product.objects.create(name="Blue pen", price=Decimal('2.00'), stock=5)
+        Order.objects.create(customer=cls.bob).products.add(cls.pen)
+
+    def names(self, query):
+        result = execute(query)
+        self.assertIsNone(result.errors, result.errors)
+        field = next(iter(result.data))
+        return [edge['node'] for edge in result.data[field]['edges']]
+
+    def test_customers_by_prefix_ranked_by_relevance(self):
+        # "ann" is a whole name for Ann and a prefix of Annan; the email counts less
+        nodes = self.names('{ allCustomers(search: "ann") { edges { node { name } } } }')
+        self.assertEqual([node['name'] for node in nodes], ["Ann Smith", "Bob Annan"])
+        nodes = self.names('{ allCustomers(search: "exam ann") { edges { node { name } } } }')
+        self.assertEqual([node['name'] for node in nodes], ["Ann Smith"])
+
+    def test_index_follows_updates(self):
+        Customer.objects.filter(pk=self.ann.pk).update(name="Anna Jones")
+        nodes = self.names('{ allCustomers(search: "jones") { edges { node { name } } } }')
+        self.assertEqual([node['name'] for node in nodes], ["Anna Jones"])
+        self.pen.delete()
+        self.assertEqual(self.names('{ allProducts(search: "pen") { edges { node { name } } } }'), [])
+
+    def test_orders_by_customer_or_product(self):
+        self.assertEqual(len(self.names('{ allOrders(search: "blue") { edges { node { id } } } }')), 1)
+        self.assertEqual(len(self.names('{ allOrders(search: "bob") { edges { node { id } } } }')), 1)
+        self.assertEqual(self.names('{ allOrders(search: "smith") { edges { node { id } } } }'), [])
+
+    def test_explicit_order_by_wins(self):
+        nodes = self.names('{ allCustomers(search: "ann", orderBy: "-name") { edges { node { name } } } }')
+        self.assertEqual([node['name'] for node in nodes], ["Bob Annan", "Ann Smith"])
+
+    def test_keyset_pages_search_results_by_id(self):
+        query = '''query ($after: String) {
+            allCustomers(search: "ann", keyset: true, first: 1, after: $after) {
+                edges { node { name } } pageInfo { hasNextPage endCursor }
+            }
+        }'''
+        first = execute(query)
+        self.assertIsNone(first.errors, first.errors)
+        page = first.data['allCustomers']
+        self.assertEqual([edge['node']['name'] for edge in page['edges']], ["Ann Smith"])
+        self.assertTrue(page['pageInfo']['hasNextPage'])
+        second = execute(query, {'after': page['pageInfo']['endCursor']})
+        self.assertIsNone(second.errors, second.errors)
+        self.assertEqual([edge['node']['name'] for edge in second.data['allCustomers']['edges']], ["Bob Annan"])
+
+
+class AsyncGraphQLViewTests(TestCase):
+    def setUp(self):
+        get_response_cache().store.clear()
+        products = Product.objects.bulk_create([
+            Product(name=f"Product {i}", price=Decimal('1.50'), stock=5) for i in range(2)
+        ])
+        for i in range(3):
+            customer = Customer.objects.create(name=f"Customer {i}", email=f"c{i}@example.com")
+            Order.objects.create(customer=customer).products.set(products)
+
+    def post(self, query, headers=None):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncRequestFactory
+
+        from .views import AsyncCRMGraphQLView
+
+        request = AsyncRequestFactory().post(
+            '/graphql', {'query': query}, content_type='application/json', headers=headers
+        )
+        view = AsyncCRMGraphQLView.as_view(schema=schema)
+        response = async_to_sync(view)(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_query_matches_the_sync_view(self):
+        query = """
+            { allOrders(first: 3) { edges { node { totalAmount customer { email } products { name } } } }
+              crmStats { orderCount } }
+        """
+        status, body = self.post(query)
+        self.assertEqual(status, 200)
+        sync_body = self.client.post('/graphql', {'query': query}, content_type='application/json').json()
+        self.assertEqual(body['data'], sync_body['data'])
+        self.assertEqual(body['data']['allOrders']['edges'][0]['node']['products'][1]['name'], "Product 1")
+
+    def test_mutation_runs_in_a_thread(self):
+        status, body = self.post("""
+            mutation { createCustomer(input: {name: "Dee", email: "dee@example.com"}) { customer { email } } }
+        """)
+        self.assertEqual(status, 200, body)
+        self.assertTrue(Customer.objects.filter(email="dee@example.com").exists())
+
+    def test_trace_counts_sql_of_threaded_resolvers(self):
+        status, body = self.post('{ allOrders(first: 3) { edges { node { id } } } }', headers={'X-CRM-Trace': '1'})
+        self.assertEqual(body['extensions']['tracing']['sql']['count'], 2)
+
+
+class GenerateDataTests(TestCase):
+    def generate(self, **options):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        call_command('generate_data', stdout=StringIO(), **options)
+        return list(Order.objects.order_by('pk').values_list('customer_id', 'order_date', 'total_amount'))
+
+    def test_generates_consistent_and_deterministic_data(self):
+        Customer.objects.create(name="Old", email="old@example.com")
+        first = self.generate(flush=True, customers=30, products=10, orders=120, chunk_size=50, seed=7, now='2025-06-30')
+        self.assertFalse(Customer.objects.filter(email="old@example.com").exists())
+        self.assertEqual((Customer.objects.count(), Product.objects.count(), len(first)), (30, 10, 120))
+
+        from .totals import mismatched_totals
+        self.assertFalse(mismatched_totals(Order.objects.all()).exists())
+        self.assertFalse(Order.objects.filter(order_date__lt=F('customer__created_at')).exists())
+        self.assertGreater(Customer.objects.values('created_at').distinct().count(), 1)
+        # New rows continue from the generated primary keys
+        self.assertEqual(Customer.objects.create(name="New", email="new@example.com").pk, 31)
+
+        Customer.objects.filter(email="new@example.com").delete()
+        customers = list(Customer.objects.order_by('pk').values_list('email', 'created_at'))
+        again = self.generate(flush=True, customers=30, products=10, orders=120, chunk_size=50, seed=7, now='2025-06-30')
+        self.assertEqual(again, first)
+        self.assertEqual(list(Customer.objects.order_by('pk').values_list('email', 'created_at')), customers)
+        # Dates end at --now, not at the time the command ran
+        self.assertEqual(max(row[1] for row in first).strftime('%Y-%m'), '2025-06')
+
+
+class GraphQLBenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        call_command('generate_data', stdout=StringIO(), customers=20, products=10, orders=50)
+
+    def test_catalog_covers_every_filter_and_mutation(self):
+        from .benchmarks import get_catalog
+        from .filters import CustomerFilter, OrderFilter, ProductFilter
+
+        names = {operation.name for operation in get_catalog(schema)}
+        for field, filterset in (('allCustomers', CustomerFilter), ('allProducts', ProductFilter),
+                                 ('allOrders', OrderFilter)):
+            filters = {name for name in names if name.startswith(f'{field}.')} - {f'{field}.nested', f'{field}.keyset'}
+            self.assertEqual(len(filters), len(filterset.base_filters))
+        self.assertLessEqual(set(schema.graphql_schema.mutation_type.fields), names)
+
+    def test_runs_catalog_and_rolls_back_mutations(self):
+        from .benchmarks import get_catalog, run_catalog
+
+        counts = (Customer.objects.count(), Product.objects.count(), Order.objects.count())
+        report = run_catalog(schema, get_catalog(schema), iterations=2, warmup=1)
+        self.assertEqual((Customer.objects.count(), Product.objects.count(), Order.objects.count()), counts)
+        nested = report['results']['allOrders.nested']
+        self.assertEqual(nested['sql_queries'], 3)
+        self.assertLessEqual(nested['p50_ms'], nested['p99_ms'])
+        self.assertGreater(nested['peak_memory_kib'], 0)
+
+    def test_compare_flags_regressions(self):
+        from .benchmarks import compare
+
+        def report(sql, p50, memory):
+            return {'results': {'op': {'sql_queries': sql, 'p50_ms': p50, 'peak_memory_kib': memory}}}
+
+        baseline = report(2, 10.0, 200.0)
+        # Only SQL counts by default: timings and memory depend on the machine
+        self.assertEqual(compare(report(2, 20.0, 400.0), baseline), [])
+        self.assertEqual(len(compare(report(3, 20.0, 400.0), baseline)), 1)
+        self.assertEqual(compare(report(2, 14.0, 250.0), baseline, latency=True, memory=True), [])
+        self.assertEqual(len(compare(report(3, 20.0, 400.0), baseline, latency=True, memory=True)), 3)
+
+
+class OrderReminderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        customers = [Customer.objects.create(name=f"Customer {i}", email=f"c{i}@example.com") for i in range(3)]
+        for i in range(7):
+            Order.objects.create(customer=customers[i % 3])
+
+    def setUp(self):
+        from .celery import app
+
+        eager = app.conf.task_always_eager
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', eager)
+
+    def remind(self):
+        from .reminders import send_order_reminders
+
+        with self.assertLogs('crm.reminders') as logs:
+            queued = send_order_reminders({'WINDOW_DAYS': 7, 'PAGE_SIZE': 2, 'BATCH_SIZE': 2})
+        self.assertEqual(len(logs.records), queued)
+        return sorted(record.getMessage().split('Customer Email: ')[1] for record in logs.records)
+
+    def test_one_reminder_per_customer_and_reruns_resume_after_watermark(self):
+        self.assertEqual(self.remind(), ['c0@example.com', 'c1@example.com', 'c2@example.com'])
+
+        from .reminders import send_order_reminders
+        self.assertEqual(send_order_reminders({'WINDOW_DAYS': 7, 'PAGE_SIZE': 2, 'BATCH_SIZE': 2}), 0)
+
+        Order.objects.create(customer=Customer.objects.get(email='c1@example.com'))
+        self.assertEqual(self.remind(), ['c1@example.com'])
 
-# Create your tests here.
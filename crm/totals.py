@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+from .models import OrderItem
+
+AMOUNT = DecimalField(max_digits=10, decimal_places=2)
+
+
+def item_amount():
+    """SQL expression for an order item's amount: quantity times its snapshot price."""
+    return ExpressionWrapper(F('quantity') * F('unit_price'), output_field=AMOUNT)
+
+
+def order_total_expression():
+    """SQL expression for an order's total, summed from its items."""
+    totals = (
+        OrderItem.objects.filter(order_id=OuterRef('pk'))
+        .values('order_id')
+        # SQLite sums decimals as floats; rounding keeps totals comparable to stored ones
+        .annotate(total=Round(Sum(item_amount()), 2))
+        .values('total')
+    )
+    return Coalesce(
+        Subquery(totals),
+        Value(Decimal('0.00')),
+        output_field=AMOUNT,
+    )
+
+
+def recompute_totals(queryset):
+    """Rewrite ``total_amount`` for every order in ``queryset`` with one UPDATE."""
+    return queryset.update(total_amount=order_total_expression())
+
+
+def mismatched_totals(queryset):
+    """Orders in ``queryset`` whose stored total differs from the sum of their items."""
+    # Totals written before rounding may carry float noise on SQLite
+    return queryset.alias(
+        stored_total=Round('total_amount', 2),
+        expected_total=order_total_expression(),
+    ).exclude(stored_total=F('expected_total'))
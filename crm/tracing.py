@@ -0,0 +1,137 @@
+import json
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from inspect import isawaitable
+
+from django.conf import settings
+
+from .instrumentation import QueryCounter
+
+logger = logging.getLogger('crm.tracing')
+
+DEFAULTS = {
+    # Request header asking for the trace in the response extensions
+    'HEADER': 'X-CRM-Trace',
+    # Share of other requests traced in the background, logged when slow
+    'SAMPLE_RATE': 0.0,
+    'SLOW_OPERATION_MS': 500,
+    # Slowest resolvers included in a log entry
+    'LOG_RESOLVERS': 10,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CRM_TRACING', {})}
+
+
+def _ns(seconds):
+    return int(seconds * 1e9)
+
+
+class Tracer:
+    """Per-request trace; doubles as the graphene middleware timing each resolver.
+
+    Queries are attributed to the resolver that ran them. Child fields are
+    resolved after their parent returns, so timings are exclusive.
+    """
+
+    def __init__(self, in_response=False, config=None):
+        self.in_response = in_response
+        self.config = config or get_config()
+        self.counter = QueryCounter()
+        self.resolvers = []
+        self.start_time = self.end_time = None
+        self._start = self._end = None
+
+    def __enter__(self):
+        self.start_time = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self.counter.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.counter.__exit__(*exc_info)
+        self._end = time.perf_counter()
+        self.end_time = datetime.now(timezone.utc)
+
+    def resolve(self, next, root, info, **args):
+        start = time.perf_counter()
+        count, db_time = self.counter.count, self.counter.duration
+        try:
+            result = next(root, info, **args)
+        except Exception:
+            self._record(info, start, count, db_time)
+            raise
+        if isawaitable(result):
+            return self._resolve_async(result, info, start, count, db_time)
+        self._record(info, start, count, db_time)
+        return result
+
+    async def _resolve_async(self, result, info, start, count, db_time):
+        # Under the async view other resolvers may run meanwhile, so SQL is approximate
+        try:
+            return await result
+        finally:
+            self._record(info, start, count, db_time)
+
+    def _record(self, info, start, count, db_time):
+        end = time.perf_counter()
+        self.resolvers.append({
+            'path': info.path.as_list(),
+            'parentType': str(info.parent_type),
+            'fieldName': info.field_name,
+            'returnType': str(info.return_type),
+            'startOffset': _ns(start - self._start),
+            'duration': _ns(end - start),
+            'sqlCount': self.counter.count - count,
+            'sqlDuration': _ns(self.counter.duration - db_time),
+        })
+
+    @property
+    def duration(self):
+        return self._end - self._start
+
+    def as_extension(self):
+        """Apollo tracing payload, plus SQL counts and time per resolver and in total."""
+        return {
+            'version': 1,
+            'startTime': self.start_time.isoformat(),
+            'endTime': self.end_time.isoformat(),
+            'duration': _ns(self.duration),
+            'sql': {'count': self.counter.count, 'duration': _ns(self.counter.duration)},
+            'execution': {'resolvers': self.resolvers},
+        }
+
+    def log_if_slow(self, operation_name):
+        duration_ms = self.duration * 1000
+        if duration_ms < self.config['SLOW_OPERATION_MS']:
+            return
+        slowest = sorted(self.resolvers, key=lambda resolver: resolver['duration'], reverse=True)
+        logger.warning(json.dumps({
+            'event': 'slow_graphql_operation',
+            'operation': operation_name,
+            'durationMs': round(duration_ms, 3),
+            'sqlCount': self.counter.count,
+            'sqlMs': round(self.counter.duration * 1000, 3),
+            'resolvers': [
+                {
+                    'path': '.'.join(str(key) for key in resolver['path']),
+                    'durationMs': round(resolver['duration'] / 1e6, 3),
+                    'sqlCount': resolver['sqlCount'],
+                    'sqlMs': round(resolver['sqlDuration'] / 1e6, 3),
+                }
+                for resolver in slowest[:self.config['LOG_RESOLVERS']]
+            ],
+        }))
+
+
+def get_tracer(request):
+    """Tracer for ``request`` when its header asks for one or it is sampled, else None."""
+    config = get_config()
+    if request.headers.get(config['HEADER']):
+        return Tracer(in_response=True, config=config)
+    if config['SAMPLE_RATE'] and random.random() < config['SAMPLE_RATE']:
+        return Tracer(config=config)
+    return None
@@ -0,0 +1,41 @@
+from itertools import islice
+
+from django.db import connection
+
+
+def chunked(iterable, size):
+    """Yield lists of at most ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def insert_rows(model, columns, rows, returning=None):
+    """INSERT already-adapted value tuples, as many per statement as the backend allows.
+
+    Used for orders and their products, where building model instances for
+    bulk_create costs several times more than the inserts themselves. With
+    ``returning`` (a column name), returns that column of every inserted row,
+    in order; the backend must have ``can_return_rows_from_bulk_insert``.
+    """
+    quote = connection.ops.quote_name
+    fields = [model._meta.get_field(column) for column in columns]
+    rows = list(rows)
+    batch_size = max(connection.ops.bulk_batch_size(fields, rows), 1)
+    prefix = 'INSERT INTO {} ({}) VALUES '.format(
+        quote(model._meta.db_table), ', '.join(quote(column) for column in columns),
+    )
+    suffix = f' RETURNING {quote(returning)}' if returning else ''
+    placeholders = '({})'.format(', '.join(['%s'] * len(columns)))
+    returned = []
+    with connection.cursor() as cursor:
+        for batch in chunked(rows, batch_size):
+            cursor.execute(
+                prefix + ', '.join([placeholders] * len(batch)) + suffix, [value for row in batch for value in row],
+            )
+            if returning:
+                returned.extend(value for value, in cursor.fetchall())
+    return returned
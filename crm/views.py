@@ -1,3 +1,420 @@
-from django.shortcuts import render
+import json
+import logging
+import sys
+from contextlib import ExitStack, contextmanager
+from inspect import isawaitable
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Model, QuerySet
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse,
+)
+from django.views.decorators.http import require_GET
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import GraphQLView, HttpError
+from graphql import (
+    ExecutionResult, GraphQLError, OperationType, execute, get_named_type, get_operation_ast, is_leaf_type,
+    validate_schema,
+)
+from graphql.language import FieldNode
+
+from .cost import QueryCost, get_config as get_cost_config
+from .documents import get_document_cache, get_persisted_query, persist_query, query_hash
+from .exports import EXPORTS, FORMATS, stream_rows
+from .instrumentation import QueryCounter
+from .response_cache import get_config as get_response_cache_config, get_response_cache
+from .routing import get_routing_state
+from .tracing import get_tracer
+
+logger = logging.getLogger('crm.queries')
+
+# execute_document, format_response and AsyncCRMGraphQLView.dispatch follow
+# graphene_django.views.GraphQLView (execute_graphql_request, get_response,
+# dispatch) of this release, which requirements.txt pins. GraphQLView has no
+# hooks for parsing, validation or execution, so they cannot call super();
+# re-check them against upstream before upgrading graphene-django.
+GRAPHENE_DJANGO_VERSION = '3.2.3'
+
+
+def _then(result, callback):
+    """Apply ``callback`` to ``result`` now, or once it resolves when it is awaitable."""
+    if isawaitable(result):
+        async def resolve():
+            return callback(await result)
+        return resolve()
+    return callback(result)
+
+
+class CRMGraphQLView(GraphQLView):
+    """GraphQLView for the CRM schema.
+
+    On top of the stock view it reuses parsed and validated documents from an
+    LRU cache, accepts Apollo-style persisted queries (only the sha256 hash is
+    sent once the server knows the query), serves repeated read-only
+    operations from the response cache (and lets the others read from the
+    replica, see crm.routing), rejects operations whose static cost
+    or depth is over budget, returns ``extensions`` and can report SQL counts
+    per operation or a per-resolver trace (see crm.tracing).
+    """
+
+    def get_graphql_params(self, request, data):
+        query, variables, operation_name, id = super().get_graphql_params(request, data)
+
+        extensions = request.GET.get('extensions') or data.get('extensions')
+        if extensions and isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        persisted = (extensions or {}).get('persistedQuery') if isinstance(extensions, dict) else None
+        if not persisted:
+            return query, variables, operation_name, id
+
+        sha256_hash = persisted.get('sha256Hash')
+        if not sha256_hash:
+            raise HttpError(HttpResponseBadRequest("persistedQuery requires a sha256Hash."))
+        if query:
+            if query_hash(query) != sha256_hash:
+                raise HttpError(HttpResponseBadRequest("provided sha does not match query"))
+            persist_query(sha256_hash, query)
+            return query, variables, operation_name, id
+
+        query = get_persisted_query(sha256_hash)
+        if query is None:
+            # Apollo clients answer this by resending the hash together with the query
+            raise HttpError(HttpResponse(status=200), "PersistedQueryNotFound")
+        return query, variables, operation_name, id
+
+    def get_middleware(self, request):
+        middleware = super().get_middleware(request)
+        tracer = getattr(request, 'crm_tracer', None)
+        if tracer is None:
+            return middleware
+        return [*(middleware or []), tracer]
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        with self.instrument(request) as instruments:
+            result = self.execute_document(request, query, variables, operation_name, show_graphiql)
+        return self.report(instruments, result, operation_name)
+
+    @contextmanager
+    def instrument(self, request):
+        """Count SQL (CRM_QUERY_DEBUG) and trace resolvers (crm.tracing) around an execution."""
+        counter = QueryCounter() if getattr(settings, 'CRM_QUERY_DEBUG', False) else None
+        tracer = request.crm_tracer = get_tracer(request)
+        with ExitStack() as stack:
+            for instrument in (counter, tracer):
+                if instrument is not None:
+                    stack.enter_context(instrument)
+            yield counter, tracer
+
+    def report(self, instruments, result, operation_name):
+        counter, tracer = instruments
+        if tracer is not None:
+            tracer.log_if_slow(operation_name)
+            if tracer.in_response and result is not None:
+                result.extensions = {**(result.extensions or {}), 'tracing': tracer.as_extension()}
+
+        if counter is not None:
+            logger.info(
+                "GraphQL operation %s ran %d SQL queries in %.1fms",
+                operation_name or '<anonymous>', counter.count, counter.duration * 1000,
+            )
+            if result is not None:
+                result.extensions = {
+                    **(result.extensions or {}),
+                    'sqlQueries': {'count': counter.count, 'duration': round(counter.duration * 1000, 3)},
+                }
+        return result
+
+    def execute_document(self, request, query, variables, operation_name, show_graphiql=False):
+        # GraphQLView.execute_graphql_request (see GRAPHENE_DJANGO_VERSION), with parse + validate cached
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        try:
+            document, validation_errors = get_document_cache().get(
+                schema, query, self.validation_rules, graphene_settings.MAX_VALIDATION_ERRORS
+            )
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e])
+
+        operation_ast = get_operation_ast(document, operation_name)
+
+        if (
+            request.method.lower() == 'get'
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ['POST'],
+                    "Can only perform a {} operation from a POST request.".format(operation_ast.operation.value),
+                )
+            )
+
+        if validation_errors:
+            return ExecutionResult(data=None, errors=validation_errors)
+
+        cost = None
+        cost_config = get_cost_config()
+        if cost_config['ENABLED'] and operation_ast is not None:
+            # Rejected before any resolver runs
+            cost = QueryCost(schema, document, operation_ast, variables, cost_config)
+            cost_errors = cost.errors()
+            if cost_errors:
+                return ExecutionResult(errors=cost_errors, extensions={'cost': cost.as_extension()})
+
+        result = self.execute_operation(request, schema, document, operation_ast, query, variables, operation_name)
+        if cost is None:
+            return result
+
+        def add_cost(result):
+            result.extensions = {**(result.extensions or {}), 'cost': cost.as_extension()}
+            return result
+
+        return _then(result, add_cost)
+
+    def execute_operation(self, request, schema, document, operation_ast, query, variables, operation_name):
+        routing = get_routing_state()
+        if routing is not None:
+            # Queries may read from the replica; mutations read and write the primary
+            routing.use_replica(operation_ast is not None and operation_ast.operation == OperationType.QUERY)
+
+        cache_key = self.get_response_cache_key(request, query, variables, operation_name, operation_ast)
+        if cache_key is not None:
+            data = get_response_cache().get(cache_key)
+            if data is not None:
+                return ExecutionResult(data=data)
+
+        try:
+            execute_options = {
+                'root_value': self.get_root_value(request),
+                'context_value': self.get_context(request),
+                'variable_values': variables,
+                'operation_name': operation_name,
+                'middleware': self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options['execution_context_class'] = self.execution_context_class
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get('ATOMIC_MUTATIONS', False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+
+            result = execute(schema, document, **execute_options)
+            if cache_key is None:
+                return result
+
+            def cache(result):
+                if not result.errors:
+                    get_response_cache().set(cache_key, result.data)
+                return result
+
+            return _then(result, cache)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+    def get_response_cache_key(self, request, query, variables, operation_name, operation_ast):
+        """Cache key for a read-only operation, or None when the result must not be cached."""
+        if operation_ast is None or operation_ast.operation != OperationType.QUERY:
+            return None
+        if not get_response_cache_config()['ENABLED']:
+            return None
+        routing = get_routing_state()
+        if routing is not None and (routing.sticky or routing.wrote):
+            # A cached result may predate this client's write (read from a lagging replica)
+            return None
+
+        # Anything but a plain field at the root (e.g. a fragment) depends on every tag
+        root_fields = [
+            selection.name.value if isinstance(selection, FieldNode) else None
+            for selection in operation_ast.selection_set.selections
+        ]
+        user = getattr(request, 'user', None)
+        viewer = user.pk if user is not None and user.is_authenticated else None
+        response_cache = get_response_cache()
+        return response_cache.key(
+            query_hash(query), operation_name, variables, viewer, response_cache.tags_for(root_fields)
+        )
+
+    def get_response(self, request, data, show_graphiql=False):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+        return self.format_response(request, execution_result, id, show_graphiql)
+
+    def format_response(self, request, execution_result, id, show_graphiql=False):
+        # The second half of GraphQLView.get_response (see GRAPHENE_DJANGO_VERSION), plus extensions
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        status_code = 200
+        if not execution_result:
+            return None, status_code
+
+        response = {}
+        if execution_result.errors:
+            set_rollback()
+            response['errors'] = [self.format_error(e) for e in execution_result.errors]
+
+        if execution_result.errors and any(not getattr(e, 'path', None) for e in execution_result.errors):
+            status_code = 400
+        else:
+            response['data'] = execution_result.data
+
+        if execution_result.extensions:
+            response['extensions'] = execution_result.extensions
+
+        if self.batch:
+            response['id'] = id
+            response['status'] = status_code
+
+        return self.json_encode(request, response, pretty=show_graphiql), status_code
+
+
+class ThreadedResolverMiddleware:
+    """Runs the resolvers that may touch the database in a worker thread.
+
+    Root fields (which fetch pages and run the planned prefetches) and
+    relations of model instances (which may fall back to the loaders) go
+    through ``sync_to_async(thread_sensitive=True)``, so one request's ORM
+    work stays on one connection. Everything else resolves on the event loop.
+    """
+
+    def resolve(self, next, root, info, **args):
+        if info.path.prev is None or (isinstance(root, Model) and not is_leaf_type(get_named_type(info.return_type))):
+            return sync_to_async(self.resolve_in_thread, thread_sensitive=True)(next, root, info, **args)
+        return next(root, info, **args)
+
+    @staticmethod
+    def resolve_in_thread(next, root, info, **args):
+        result = next(root, info, **args)
+        # A lazy queryset would otherwise be evaluated on the event loop
+        if isinstance(result, QuerySet):
+            return list(result)
+        return result
+
+
+class AsyncCRMGraphQLView(CRMGraphQLView):
+    """CRMGraphQLView for ASGI, executing queries with graphql-core's async executor.
+
+    While a query waits on the database the event loop serves other requests.
+    Mutations run whole in a worker thread, so ATOMIC_MUTATIONS and the
+    mutations' transactions behave as in the synchronous view.
+    """
+
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        # GraphQLView.dispatch (see GRAPHENE_DJANGO_VERSION), awaiting the response
+        try:
+            if request.method.lower() not in ('get', 'post'):
+                raise HttpError(
+                    HttpResponseNotAllowed(['GET', 'POST'], "GraphQL only supports GET and POST requests.")
+                )
+
+            if hasattr(request, 'auser'):
+                # Loaded here: the lazy request.user would query the session synchronously
+                request.user = await request.auser()
+
+            data = self.parse_body(request)
+            show_graphiql = self.graphiql and self.can_display_graphiql(request, data)
+            if show_graphiql:
+                return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+            if self.batch:
+                responses = [await self.get_response(request, entry) for entry in data]
+                result = '[{}]'.format(','.join([response[0] for response in responses]))
+                status_code = responses and max(responses, key=lambda response: response[1])[1] or 200
+            else:
+                result, status_code = await self.get_response(request, data, show_graphiql)
+
+            return HttpResponse(status=status_code, content=result, content_type='application/json')
+
+        except HttpError as e:
+            response = e.response
+            response['Content-Type'] = 'application/json'
+            response.content = self.json_encode(request, {'errors': [self.format_error(e)]})
+            return response
+
+    async def get_response(self, request, data, show_graphiql=False):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+        execution_result = await self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+        return self.format_response(request, execution_result, id, show_graphiql)
+
+    async def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        # Connections are per thread, so the SQL counters must hook the one the ORM runs in
+        instrumentation = self.instrument(request)
+        instruments = await sync_to_async(instrumentation.__enter__, thread_sensitive=True)()
+        try:
+            result = self.execute_document(request, query, variables, operation_name, show_graphiql)
+            if isawaitable(result):
+                result = await result
+        finally:
+            await sync_to_async(instrumentation.__exit__, thread_sensitive=True)(*sys.exc_info())
+        return self.report(instruments, result, operation_name)
+
+    def execute_operation(self, request, schema, document, operation_ast, *args):
+        if operation_ast is None or operation_ast.operation != OperationType.QUERY:
+            return sync_to_async(super().execute_operation, thread_sensitive=True)(
+                request, schema, document, operation_ast, *args
+            )
+        request.crm_threaded_resolvers = True
+        return super().execute_operation(request, schema, document, operation_ast, *args)
+
+    def get_middleware(self, request):
+        middleware = super().get_middleware(request)
+        if not getattr(request, 'crm_threaded_resolvers', False):
+            return middleware
+        return [*(middleware or []), ThreadedResolverMiddleware()]
+
+
+@require_GET
+def export_view(request, resource, format):
+    """Stream every ``resource`` row matching the query string filters as CSV or NDJSON.
+
+    Filters are the same as the GraphQL connections', in snake_case, e.g.
+    ``/export/orders.csv?order_date_gte=2024-01-01&customer_name=ann``.
+    """
+    export = EXPORTS.get(resource)
+    if export is None or format not in FORMATS:
+        raise Http404(f"No {format} export for {resource}.")
+
+    filterset = export.filterset_class(request.GET, queryset=export.model.objects.all())
+    if not filterset.is_valid():
+        return JsonResponse({'errors': filterset.errors}, status=400)
+
+    response = StreamingHttpResponse(stream_rows(export, filterset.qs, format), content_type=FORMATS[format])
+    response['Content-Disposition'] = f'attachment; filename="{resource}.{format}"'
+    return response